@@ -1,6 +1,9 @@
+import asyncio
 import os
+import threading
 from abc import ABC
-from openai import OpenAI, RateLimitError, APIError
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from openai import AsyncOpenAI, OpenAI, RateLimitError, APIError
 from dotenv import load_dotenv
 from tenacity import (
     retry,
@@ -11,39 +14,189 @@ from tenacity import (
 )
 import logging
 
+from .rate_limiter import discover_api_keys, estimate_tokens, get_key_pool, parse_reset
+from .response_cache import cache_key, get_response_cache
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+
+def llm_concurrency() -> int:
+    """Max LLM calls in flight per fan-out (LLM_CONCURRENCY, default 8 per API key); the key pool paces them."""
+    default = 8 * max(1, len(discover_api_keys()))
+    return max(1, int(os.getenv("LLM_CONCURRENCY", default)))
+
+
+async def gather_limited(coros: Iterable[Awaitable[Any]], limit: Optional[int] = None) -> List[Any]:
+    """Await `coros` with at most `limit` running at once; results (or exceptions) in input order."""
+    semaphore = asyncio.Semaphore(limit or llm_concurrency())
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros), return_exceptions=True)
+
+
+def run_limited(coros: Iterable[Awaitable[Any]], limit: Optional[int] = None) -> List[Any]:
+    """
+    gather_limited on a fresh event loop (asyncio.run), closing the async
+    clients opened on that loop before it goes away.
+    """
+    async def main():
+        try:
+            return await gather_limited(coros, limit)
+        finally:
+            await close_async_clients()
+
+    return asyncio.run(main())
+
+
+def _is_valid(response, validate: Optional[Callable[[str], Any]]) -> bool:
+    if validate is None:
+        return True
+    try:
+        validate(response.choices[0].message.content)
+        return True
+    except Exception:
+        return False
+
+
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    return parse_reset(headers.get("retry-after"))
+
+
+_sync_clients: Dict[str, OpenAI] = {}
+_sync_clients_lock = threading.Lock()
+
+
+def _client_for(key: str) -> OpenAI:
+    # One pooled client per key, shared by every agent in the process. SDK-level
+    # retries are off: a 429 should move to another key, not wait on this one.
+    with _sync_clients_lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = OpenAI(base_url=GROQ_BASE_URL, api_key=key, max_retries=0)
+            _sync_clients[key] = client
+        return client
+
+
+# httpx async pools are bound to their event loop, so async clients are kept
+# per loop (and per key), shared by every agent running on it.
+_async_clients: Dict[Any, Dict[str, AsyncOpenAI]] = {}
+_async_clients_lock = threading.Lock()
+
+
+def _async_client_for(key: str) -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        # Loops closed without close_async_clients (e.g. a bare asyncio.run)
+        # can no longer await aclose; drop their clients so they are collected.
+        for stale in [l for l in _async_clients if l.is_closed()]:
+            del _async_clients[stale]
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(base_url=GROQ_BASE_URL, api_key=key, max_retries=0)
+            clients[key] = client
+        return client
+
+
+async def close_async_clients() -> None:
+    """Close the async clients opened on the running loop; call before the loop ends."""
+    with _async_clients_lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        try:
+            await client.close()
+        except Exception as e:
+            logger.debug(f"Closing async client failed: {e}")
+
 
 class BaseAgent(ABC):
     def __init__(self, model: str):
-        self.api_keys = [
-            key for key in [os.getenv("GROQ_API_KEY"), os.getenv("GROQ_API_KEY2")]
-            if key
-        ]
-        if not self.api_keys:
-             raise ValueError("No GROQ_API_KEY or GROQ_API_KEY2 found in environment.")
-        
-        self.current_key_index = 0
+        self.key_pool = get_key_pool()
+        self.api_keys = self.key_pool.keys
         self.model = model
-        self._init_client()
-
-    def _init_client(self):
-        self.client = OpenAI(
-            base_url="https://api.groq.com/openai/v1",
-            api_key=self.api_keys[self.current_key_index]
-        )
-        # Log safely (mask key)
-        key_masked = self.api_keys[self.current_key_index][:8] + "..."
-        logger.info(f"Initialized Groq client with key #{self.current_key_index + 1} ({key_masked})")
-
-    def _rotate_key(self):
-        if len(self.api_keys) > 1:
-            self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-            logger.warning(f"⚠️ Rate Limit hit. Switching to API Key #{self.current_key_index + 1}...")
-            self._init_client()
-            return True
-        return False
+        logger.info(f"Groq key pool ready with {len(self.api_keys)} key(s)")
+
+    def _on_error(self, key: str, estimate: int, error: Exception) -> None:
+        self.key_pool.complete(key, estimate)
+        if isinstance(error, RateLimitError):
+            self.key_pool.penalize(key, _retry_after(error))
+
+    def _create(self, messages, **kwargs):
+        estimate = estimate_tokens(messages, kwargs.get("max_tokens"))
+        key = self.key_pool.acquire(estimate)
+        try:
+            raw = _client_for(key).chat.completions.with_raw_response.create(
+                model=self.model,
+                messages=messages,
+                **kwargs
+            )
+        except Exception as e:
+            self._on_error(key, estimate, e)
+            raise
+        return self._finish(key, raw, estimate)
+
+    async def _acreate(self, messages, **kwargs):
+        estimate = estimate_tokens(messages, kwargs.get("max_tokens"))
+        key = await self.key_pool.acquire_async(estimate)
+        try:
+            raw = await _async_client_for(key).chat.completions.with_raw_response.create(
+                model=self.model,
+                messages=messages,
+                **kwargs
+            )
+        except Exception as e:
+            self._on_error(key, estimate, e)
+            raise
+        return self._finish(key, raw, estimate)
+
+    def _finish(self, key: str, raw, estimate: int):
+        # The reservation is released even if the body fails to parse; the
+        # headers still carry the server's quota.
+        used_tokens = None
+        try:
+            response = raw.parse()
+            used_tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+        finally:
+            self.key_pool.complete(key, estimate, raw.headers, used_tokens)
+        return response
+
+    def get_completion(self, messages, cache: bool = True, validate: Optional[Callable[[str], Any]] = None, **kwargs):
+        """
+        Wrapper for chat.completions.create. Identical requests are answered from
+        the persistent response cache; pass cache=False for calls whose output
+        must not be reused. `validate` (e.g. a pydantic model_validate_json) keeps
+        responses it rejects out of the cache.
+        """
+        store = get_response_cache() if cache else None
+        if store is None:
+            return self._complete(messages, **kwargs)
+        key = cache_key(self.model, messages, **kwargs)
+        response = store.get(key)
+        if response is None or not _is_valid(response, validate):
+            response = self._complete(messages, **kwargs)
+            if _is_valid(response, validate):
+                store.set(key, self.model, response)
+        return response
+
+    async def aget_completion(self, messages, cache: bool = True, validate: Optional[Callable[[str], Any]] = None, **kwargs):
+        """Async get_completion; cache lookups run in a worker thread."""
+        store = get_response_cache() if cache else None
+        if store is None:
+            return await self._acomplete(messages, **kwargs)
+        key = cache_key(self.model, messages, **kwargs)
+        response = await asyncio.to_thread(store.get, key)
+        if response is None or not _is_valid(response, validate):
+            response = await self._acomplete(messages, **kwargs)
+            if _is_valid(response, validate):
+                await asyncio.to_thread(store.set, key, self.model, response)
+        return response
 
     @retry(
         retry=retry_if_exception_type(APIError),
@@ -51,28 +204,34 @@ class BaseAgent(ABC):
         stop=stop_after_attempt(5),
         before_sleep=before_sleep_log(logger, logging.WARNING)
     )
-    def get_completion(self, messages, **kwargs):
+    def _complete(self, messages, **kwargs):
         """
-        Wrapper for chat.completions.create with manual failover for Rate Limits
-        and Tenacity retry for other API Errors.
+        Sends through the key pool. A Rate Limit penalizes that key and retries
+        at once on the key with the most headroom; once every key has been tried,
+        Tenacity's backoff takes over, as it does for other API Errors.
         """
-        try:
-            return self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                **kwargs
-            )
-        except RateLimitError as e:
-            # Try switching key
-            if self._rotate_key():
-                # Retry immediately with new key
-                return self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    **kwargs
-                )
-            else:
-                # No keys left or single key, re-raise to let Tenacity/Caller handle it
-                logger.error("Rate limit reached and no other keys available.")
-                raise e
+        for attempt in range(len(self.api_keys)):
+            try:
+                return self._create(messages, **kwargs)
+            except RateLimitError:
+                if attempt == len(self.api_keys) - 1:
+                    logger.error("Rate limit reached on every API key.")
+                    raise
+                logger.warning("⚠️ Rate Limit hit. Retrying on the key with the most headroom...")
 
+    @retry(
+        retry=retry_if_exception_type(APIError),
+        wait=wait_exponential(multiplier=1, min=4, max=60),
+        stop=stop_after_attempt(5),
+        before_sleep=before_sleep_log(logger, logging.WARNING)
+    )
+    async def _acomplete(self, messages, **kwargs):
+        """Async _complete: same pool, failover and retries, without blocking the loop."""
+        for attempt in range(len(self.api_keys)):
+            try:
+                return await self._acreate(messages, **kwargs)
+            except RateLimitError:
+                if attempt == len(self.api_keys) - 1:
+                    logger.error("Rate limit reached on every API key.")
+                    raise
+                logger.warning("⚠️ Rate Limit hit. Retrying on the key with the most headroom...")
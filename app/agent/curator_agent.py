@@ -1,6 +1,35 @@
-from typing import List
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
-from .base import BaseAgent
+from .base import BaseAgent, gather_limited, llm_concurrency
+from .token_budget import count_tokens, fit_to_budget
+
+logger = logging.getLogger(__name__)
+
+# Token budget for the digest list in one ranking prompt, and the completion
+# allowance per ranked entry (id, score, rank and a one-line reasoning).
+RANKING_PROMPT_TOKENS = int(os.getenv("RANKING_PROMPT_TOKENS", "6000"))
+OUTPUT_TOKENS_PER_RANK = 80
+# Summary space each digest is guaranteed before more digests are admitted.
+MIN_SUMMARY_TOKENS = 30
+
+# Chunked ranking: candidate sets larger than RANKING_CHUNK_SIZE are scored in
+# chunks of that size in parallel, then the best RANKING_FINAL_POOL are ranked
+# together with reasoning.
+RANKING_CHUNK_SIZE = int(os.getenv("RANKING_CHUNK_SIZE", "20"))
+RANKING_FINAL_POOL = int(os.getenv("RANKING_FINAL_POOL", "20"))
+OUTPUT_TOKENS_PER_SCORE = 25
+CHUNK_SCORE_REASONING = "Ranked by relevance score from the chunked pass"
+
+# The call that produced a RankedArticle's score: the one-call ranking of a
+# small set, the refine call over the final pool, or a score-only chunk call.
+# Chunk scores are not on the same footing as ranked ones and are only
+# compared with each other.
+SCORE_PASS_SINGLE = "single"
+SCORE_PASS_REFINE = "refine"
+SCORE_PASS_CHUNK = "chunk"
 
 
 class RankedArticle(BaseModel):
@@ -8,12 +37,22 @@ class RankedArticle(BaseModel):
     relevance_score: float = Field(description="Relevance score from 0.0 to 10.0", ge=0.0, le=10.0)
     rank: int = Field(description="Rank position (1 = most relevant)", ge=1)
     reasoning: str = Field(description="Brief explanation of why this article is ranked here")
+    score_pass: str = Field(default=SCORE_PASS_SINGLE, exclude=True)
 
 
 class RankedDigestList(BaseModel):
     articles: List[RankedArticle] = Field(description="List of ranked articles")
 
 
+class ScoredDigest(BaseModel):
+    digest_id: str
+    relevance_score: float = Field(ge=0.0, le=10.0)
+
+
+class ScoredDigestList(BaseModel):
+    scores: List[ScoredDigest]
+
+
 CURATOR_PROMPT = """You are an expert AI news curator specializing in personalized content ranking for AI professionals.
 
 Your role is to analyze and rank AI-related news articles, research papers, and video content based on a user's specific profile, interests, and background.
@@ -59,10 +98,27 @@ Interests:
 Preferences:
 {pref_text}"""
 
-    def rank_digests(self, digests: List[dict]) -> List[RankedArticle]:
-        if not digests:
-            return []
-        
+    def fit_digests(self, digests: List[dict]) -> List[dict]:
+        """
+        Size the digests to RANKING_PROMPT_TOKENS: summaries share what is left
+        after ids, titles and types, and if those plus a MIN_SUMMARY_TOKENS
+        snippet each overflow, only the first digests that fit are kept (see
+        _chunks, which moves the rest into the next chunk).
+        """
+        headers = [f"ID: {d['id']}\nTitle: {d['title']}\nType: {d['article_type']}" for d in digests]
+        kept, used = 0, 0
+        for header in headers:
+            cost = count_tokens(header) + 4 + MIN_SUMMARY_TOKENS
+            if used + cost > RANKING_PROMPT_TOKENS:
+                break
+            kept, used = kept + 1, used + cost
+        summaries = fit_to_budget(
+            [d.get("summary") or "" for d in digests[:kept]],
+            RANKING_PROMPT_TOKENS - used + kept * MIN_SUMMARY_TOKENS,
+        )
+        return [{**d, "summary": summary} for d, summary in zip(digests, summaries)]
+
+    def _ranking_messages(self, digests: List[dict]) -> List[dict]:
         digest_list = "\n\n".join([
             f"ID: {d['id']}\nTitle: {d['title']}\nSummary: {d['summary']}\nType: {d['article_type']}"
             for d in digests
@@ -85,20 +141,171 @@ Output strictly valid JSON matching this schema:
     }}
   ]
 }}"""
+        return [
+            {"role": "system", "content": self.system_prompt + "\n\nYou must output valid JSON."},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _scoring_messages(self, digests: List[dict]) -> List[dict]:
+        digest_list = "\n\n".join([
+            f"ID: {d['id']}\nTitle: {d['title']}\nSummary: {d['summary']}\nType: {d['article_type']}"
+            for d in digests
+        ])
+
+        user_prompt = f"""Score these {len(digests)} AI news digests for relevance to the user profile:
+
+{digest_list}
+
+Give each digest a relevance score (0.0-10.0). No ranking or reasoning is needed.
+
+Output strictly valid JSON matching this schema:
+{{
+  "scores": [
+    {{"digest_id": "string", "relevance_score": float}}
+  ]
+}}"""
+        return [
+            {"role": "system", "content": self.system_prompt + "\n\nYou must output valid JSON."},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _chunks(self, digests: List[dict]) -> List[List[dict]]:
+        """
+        Up to RANKING_CHUNK_SIZE fitted digests per chunk. Digests that do not
+        fit a chunk's prompt budget start the next chunk, so none goes unscored.
+        """
+        size = max(1, RANKING_CHUNK_SIZE)
+        chunks, start = [], 0
+        while start < len(digests):
+            chunk = self.fit_digests(digests[start:start + size])
+            if not chunk:
+                logger.warning(f"Digest {digests[start]['id']} alone exceeds the ranking prompt budget; skipping it")
+                start += 1
+                continue
+            chunks.append(chunk)
+            start += len(chunk)
+        return chunks
+
+    def _scoring_kwargs(self, chunk: List[dict]) -> dict:
+        return dict(
+            messages=self._scoring_messages(chunk),
+            temperature=0.3,
+            max_tokens=OUTPUT_TOKENS_PER_SCORE * len(chunk) + 50,
+            response_format={"type": "json_object"},
+            validate=ScoredDigestList.model_validate_json,
+        )
+
+    def _ranking_kwargs(self, digests: List[dict]) -> dict:
+        return dict(
+            messages=self._ranking_messages(digests),
+            temperature=0.3,
+            max_tokens=OUTPUT_TOKENS_PER_RANK * len(digests) + 100,
+            response_format={"type": "json_object"},
+            validate=RankedDigestList.model_validate_json,
+        )
+
+    def _merge_scores(self, chunks: List[List[dict]], responses: list) -> Dict[str, float]:
+        """{digest_id: score} over every chunk that came back valid; failed chunks are only logged."""
+        scores: Dict[str, float] = {}
+        for chunk, response in zip(chunks, responses):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                ids = {d["id"] for d in chunk}
+                parsed = ScoredDigestList.model_validate_json(response.choices[0].message.content)
+                scores.update((s.digest_id, s.relevance_score) for s in parsed.scores if s.digest_id in ids)
+            except Exception as e:
+                print(f"Error scoring digest chunk ({len(chunk)} digests): {e}")
+        return scores
+
+    def _final_pool(self, digests: List[dict], scores: Dict[str, float]) -> List[dict]:
+        scored = sorted((d for d in digests if d["id"] in scores), key=lambda d: -scores[d["id"]])
+        return scored[:RANKING_FINAL_POOL]
+
+    def _combine(self, digests: List[dict], scores: Dict[str, float], refined: Optional[List[RankedArticle]]) -> List[RankedArticle]:
+        """
+        Refined top-K first (hallucinated ids dropped, omitted pool members put
+        back by chunk score), then every other scored digest by chunk score.
+        Ranks are renumbered 1..n.
+        """
+        ordered: List[RankedArticle] = []
+        seen = set()
+        for article in refined or []:
+            if article.digest_id in scores and article.digest_id not in seen:
+                article.score_pass = SCORE_PASS_REFINE
+                ordered.append(article)
+                seen.add(article.digest_id)
+        for d in sorted(digests, key=lambda d: -scores.get(d["id"], -1.0)):
+            if d["id"] in scores and d["id"] not in seen:
+                ordered.append(RankedArticle(
+                    digest_id=d["id"],
+                    relevance_score=scores[d["id"]],
+                    rank=1,
+                    reasoning=CHUNK_SCORE_REASONING,
+                    score_pass=SCORE_PASS_CHUNK,
+                ))
+                seen.add(d["id"])
+        for position, article in enumerate(ordered, start=1):
+            article.rank = position
+        return ordered
+
+    def _parse_ranking(self, response) -> List[RankedArticle]:
+        return RankedDigestList.model_validate_json(response.choices[0].message.content).articles
+
+    def rank_digests(self, digests: List[dict]) -> List[RankedArticle]:
+        """
+        Rank digests for the user. Up to RANKING_CHUNK_SIZE digests that fit one
+        prompt are ranked in one call; larger sets are scored in parallel chunks and the best
+        RANKING_FINAL_POOL are ranked again with reasoning, so wall-clock time
+        stays close to that of a single chunk and a bad response only costs
+        its own chunk.
+        """
+        chunks = self._chunks(digests)
+        if not chunks:
+            return []
+        if len(chunks) == 1:
+            try:
+                return self._parse_ranking(self.get_completion(**self._ranking_kwargs(chunks[0])))
+            except Exception as e:
+                print(f"Error ranking digests: {e}")
+                return []
+
+        def score(chunk):
+            try:
+                return self.get_completion(**self._scoring_kwargs(chunk))
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), llm_concurrency())) as pool:
+            responses = list(pool.map(score, chunks))
+        scores = self._merge_scores(chunks, responses)
+        refined = None
+        pool_digests = self._final_pool(digests, scores)
+        if pool_digests:
+            try:
+                refined = self._parse_ranking(self.get_completion(**self._ranking_kwargs(pool_digests)))
+            except Exception as e:
+                print(f"Error refining top digests, keeping chunk scores: {e}")
+        return self._combine(digests, scores, refined)
 
-        try:
-            response = self.get_completion(
-                messages=[
-                    {"role": "system", "content": self.system_prompt + "\n\nYou must output valid JSON."},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            ranked_list = RankedDigestList.model_validate_json(content)
-            return ranked_list.articles
-        except Exception as e:
-            print(f"Error ranking digests: {e}")
+    async def arank_digests(self, digests: List[dict]) -> List[RankedArticle]:
+        """Async rank_digests, so many users can be ranked concurrently."""
+        chunks = self._chunks(digests)
+        if not chunks:
             return []
+        if len(chunks) == 1:
+            try:
+                return self._parse_ranking(await self.aget_completion(**self._ranking_kwargs(chunks[0])))
+            except Exception as e:
+                print(f"Error ranking digests: {e}")
+                return []
+        responses = await gather_limited(self.aget_completion(**self._scoring_kwargs(c)) for c in chunks)
+        scores = self._merge_scores(chunks, responses)
+        refined = None
+        pool_digests = self._final_pool(digests, scores)
+        if pool_digests:
+            try:
+                refined = self._parse_ranking(await self.aget_completion(**self._ranking_kwargs(pool_digests)))
+            except Exception as e:
+                print(f"Error refining top digests, keeping chunk scores: {e}")
+        return self._combine(digests, scores, refined)
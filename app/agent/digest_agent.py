@@ -1,6 +1,9 @@
-from typing import Optional
-from pydantic import BaseModel
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from pydantic import BaseModel, ValidationError
 from .base import BaseAgent
+from .token_budget import count_tokens, truncate_to_tokens
 
 PROMPT = """You are an expert AI news analyst specializing in summarizing technical articles, research papers, and video content about artificial intelligence.
 
@@ -14,11 +17,73 @@ Guidelines:
 - Avoid marketing fluff - focus on substance"""
 
 
+BATCH_PROMPT_SUFFIX = """
+
+You will receive several items, each tagged with a key. Write one independent digest per item."""
+
+# Per-article content budget in tokens, shared by single and batched requests
+# (~8000 characters of prose), and the completion allowance per digest.
+MAX_CONTENT_TOKENS = int(os.getenv("DIGEST_CONTENT_TOKENS", "2000"))
+OUTPUT_TOKENS_PER_DIGEST = 250
+
+
 class DigestOutput(BaseModel):
     title: str
     summary: str
 
 
+def parse_digest_batch(content: str) -> Dict[str, DigestOutput]:
+    """{key: DigestOutput} for the well-formed entries of a batched response."""
+    parsed: Dict[str, DigestOutput] = {}
+    for entry in json.loads(content).get("digests") or []:
+        try:
+            parsed[str(entry["key"])] = DigestOutput.model_validate(entry)
+        except (KeyError, TypeError, ValidationError):
+            continue
+    return parsed
+
+
+def require_digest_keys(keys: Iterable[str]):
+    """Cache validator: the response must hold a valid digest for every key."""
+    def validate(content: str) -> None:
+        missing = set(keys) - set(parse_digest_batch(content))
+        if missing:
+            raise ValueError(f"batched digest response is missing keys {sorted(missing)}")
+    return validate
+
+
+def budget_content(content: Optional[str]) -> str:
+    """Article content cut to MAX_CONTENT_TOKENS, keeping its opening and closing sections."""
+    return truncate_to_tokens(content or "", MAX_CONTENT_TOKENS)
+
+
+def pack_digest_batches(
+    articles: Iterable[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    max_items: Optional[int] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Greedily group articles (dicts with title and content) into batches whose
+    prompt content fits `token_budget` (DIGEST_BATCH_TOKENS, default 6000) and
+    holds at most `max_items` (DIGEST_BATCH_MAX_ITEMS, default 8). An article
+    larger than the budget gets a batch of its own. Costs use the budgeted
+    content that the prompts will actually carry.
+    """
+    token_budget = token_budget or int(os.getenv("DIGEST_BATCH_TOKENS", "6000"))
+    max_items = max_items or int(os.getenv("DIGEST_BATCH_MAX_ITEMS", "8"))
+    batch, used = [], 0
+    for article in articles:
+        content = budget_content(article.get("content"))
+        cost = count_tokens(article["title"]) + count_tokens(content) + OUTPUT_TOKENS_PER_DIGEST
+        if batch and (used + cost > token_budget or len(batch) >= max_items):
+            yield batch
+            batch, used = [], 0
+        batch.append(article)
+        used += cost
+    if batch:
+        yield batch
+
+
 class DigestAgent(BaseAgent):
     def __init__(self):
         super().__init__("llama-3.3-70b-versatile")
@@ -28,7 +93,7 @@ class DigestAgent(BaseAgent):
         try:
             user_prompt = f"""Create a digest for this {article_type}:
 Title: {title}
-Content: {content[:8000]}
+Content: {budget_content(content)}
 
 Output strictly valid JSON matching this schema:
 {{
@@ -42,7 +107,9 @@ Output strictly valid JSON matching this schema:
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.7,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                max_tokens=OUTPUT_TOKENS_PER_DIGEST,
+                validate=DigestOutput.model_validate_json,
             )
             
             content = response.choices[0].message.content
@@ -51,3 +118,58 @@ Output strictly valid JSON matching this schema:
             print(f"Error generating digest: {e}")
             return None
 
+    def generate_digests(self, articles: List[Dict[str, Any]]) -> Dict[str, Optional[DigestOutput]]:
+        """
+        Digest several articles (dicts with key, title, content, article_type) in
+        one chat completion. Items missing or malformed in the response, or the
+        whole batch if the request fails, fall back to generate_digest per article;
+        only complete responses are cached. Returns {key: DigestOutput or None}.
+        """
+        if len(articles) == 1:
+            a = articles[0]
+            return {a["key"]: self.generate_digest(a["title"], a["content"], a["article_type"])}
+
+        # Short positional keys cost fewer prompt and output tokens than the
+        # natural ids, and cannot be mangled by the model; mapped back below.
+        keys = [str(position) for position in range(1, len(articles) + 1)]
+        parsed: Dict[str, DigestOutput] = {}
+        try:
+            items = "\n\n".join(
+                f"""[key: {key}] ({a["article_type"]})
+Title: {a["title"]}
+Content: {budget_content(a["content"])}"""
+                for key, a in zip(keys, articles)
+            )
+            user_prompt = f"""Create a digest for each of these {len(articles)} items:
+
+{items}
+
+Output strictly valid JSON matching this schema, with exactly one entry per key:
+{{
+  "digests": [
+    {{"key": "item key", "title": "Compelling title (5-10 words)", "summary": "2-3 sentence summary"}}
+  ]
+}}"""
+
+            response = self.get_completion(
+                messages=[
+                    {"role": "system", "content": self.system_prompt + BATCH_PROMPT_SUFFIX + "\n\nYou must output valid JSON."},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.7,
+                response_format={"type": "json_object"},
+                max_tokens=OUTPUT_TOKENS_PER_DIGEST * len(articles),
+                validate=require_digest_keys(keys),
+            )
+            parsed = parse_digest_batch(response.choices[0].message.content)
+        except Exception as e:
+            print(f"Error generating batched digests: {e}")
+
+        results: Dict[str, Optional[DigestOutput]] = {}
+        for key, a in zip(keys, articles):
+            digest = parsed.get(key)
+            if digest is None:
+                digest = self.generate_digest(a["title"], a["content"], a["article_type"])
+            results[a["key"]] = digest
+        return results
+
@@ -1,7 +1,66 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
-from .base import BaseAgent
+from .base import BaseAgent, llm_concurrency
+
+# Users per batched introduction request, titles shown per user, and the
+# completion allowance per introduction.
+INTRO_BATCH_SIZE = int(os.getenv("EMAIL_INTRO_BATCH_SIZE", "25"))
+INTRO_TITLES_PER_USER = 5
+OUTPUT_TOKENS_PER_INTRO = 120
+
+
+def intro_mode() -> str:
+    """EMAIL_INTRO_MODE: "llm" (default, batched across users) or "template" (no LLM calls)."""
+    return os.getenv("EMAIL_INTRO_MODE", "llm").strip().lower()
+
+
+def _title_of(article) -> str:
+    return article.title if hasattr(article, "title") else article.get("title", "N/A")
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Words too common in AI news titles to tie an introduction to its reader.
+_COMMON_WORDS = frozenset("""
+about after from have into more over than that their this what when with your
+news new today introducing announces launches release update model models
+""".split())
+
+
+def _title_terms(titles: List[str]) -> set:
+    return {
+        w for t in titles for w in _WORD.findall((t or "").lower())
+        if len(w) >= 4 and w not in _COMMON_WORDS
+    }
+
+
+def mentions_titles(text: str, titles: List[str]) -> bool:
+    """True when `text` shares a distinctive word with `titles` (or there is none to share)."""
+    terms = _title_terms(titles)
+    return not terms or bool(terms & set(_WORD.findall(text.lower())))
+
+
+def parse_intro_batch(content: str) -> Dict[str, str]:
+    """{key: introduction} for the well-formed entries of a batched response."""
+    entries = json.loads(content).get("intros") or []
+    return {
+        str(e["key"]): e["introduction"].strip()
+        for e in entries
+        if isinstance(e, dict) and e.get("key") is not None and isinstance(e.get("introduction"), str) and e["introduction"].strip()
+    }
+
+
+def require_intro_keys(keys: List[str]):
+    """Cache validator: the response must hold an introduction for every key."""
+    def validate(content: str) -> None:
+        missing = set(keys) - set(parse_intro_batch(content))
+        if missing:
+            raise ValueError(f"batched introduction response is missing keys {sorted(missing)}")
+    return validate
 
 
 class EmailIntroduction(BaseModel):
@@ -65,12 +124,41 @@ Your role is to write a warm, professional introduction for a daily AI news dige
 Keep it concise (2-3 sentences for the introduction), friendly, and professional."""
 
 
+BATCH_INTRO_PROMPT = """You are an expert email writer for a daily AI news digest.
+
+For each reader below, write a 2-3 sentence introduction that previews their top articles and highlights the most interesting themes. Do not include a greeting; it is added separately. Keep each one friendly, concise and professional."""
+
+
+def default_greeting(name: str, current_date: Optional[str] = None) -> str:
+    current_date = current_date or datetime.now().strftime('%B %d, %Y')
+    return f"Hey {name}, here is your daily digest of AI news for {current_date}."
+
+
+def template_introduction(name: str, ranked_articles: List, current_date: Optional[str] = None) -> EmailIntroduction:
+    """Deterministic introduction built from the top titles; used when quota is tight or a batch fails."""
+    titles = [_title_of(a) for a in ranked_articles[:3]]
+    if not titles:
+        text = "No articles were ranked today."
+    elif len(titles) == 1:
+        text = f"Today's pick for you is \"{titles[0]}\"."
+    else:
+        rest = len(ranked_articles) - 1
+        text = (
+            f"Today's digest leads with \"{titles[0]}\", followed by \"{titles[1]}\""
+            f"{' and ' + str(rest - 1) + ' more' if rest > 1 else ''}, "
+            f"all ranked by relevance to your interests."
+        )
+    return EmailIntroduction(greeting=default_greeting(name, current_date), introduction=text)
+
+
 class EmailAgent(BaseAgent):
-    def __init__(self, user_profile: dict):
+    def __init__(self, user_profile: Optional[dict] = None):
         super().__init__("llama-3.3-70b-versatile")
         self.user_profile = user_profile
 
     def generate_introduction(self, ranked_articles: List) -> EmailIntroduction:
+        if intro_mode() == "template":
+            return template_introduction(self.user_profile['name'], ranked_articles)
         if not ranked_articles:
             return EmailIntroduction(
                 greeting=f"Hey {self.user_profile['name']}, here is your daily digest of AI news for {datetime.now().strftime('%B %d, %Y')}.",
@@ -105,7 +193,8 @@ OUTPUT JSON format:
                     {"role": "user", "content": user_prompt + json_schema_prompt}
                 ],
                 temperature=0.7,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                validate=EmailIntroduction.model_validate_json,
             )
             
             content = response.choices[0].message.content
@@ -123,6 +212,86 @@ OUTPUT JSON format:
                 introduction="Here are the top 10 AI news articles ranked by relevance to your interests."
             )
 
+    def _intro_batch_messages(self, readers: List[Dict[str, Any]], current_date: str) -> List[dict]:
+        # Readers are identified by position only: names are not needed for an
+        # introduction (the greeting is templated) and are not sent to the LLM.
+        blocks = []
+        for position, reader in enumerate(readers, start=1):
+            titles = "\n".join(
+                f"- {_title_of(a)}" for a in reader["articles"][:INTRO_TITLES_PER_USER]
+            )
+            blocks.append(f"[key: {position}]\nTop articles:\n{titles}")
+        user_prompt = f"""Write introductions for {len(readers)} readers of the {current_date} digest:
+
+{chr(10).join(blocks)}
+
+Output strictly valid JSON matching this schema, with exactly one entry per key:
+{{
+  "intros": [
+    {{"key": "reader key", "introduction": "2-3 sentences"}}
+  ]
+}}"""
+        return [
+            {"role": "system", "content": BATCH_INTRO_PROMPT + "\n\nYou must output valid JSON."},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _generate_intro_batch(self, readers: List[Dict[str, Any]], current_date: str) -> Dict[str, str]:
+        """
+        {reader key: introduction} for one batch. Positional keys are mapped
+        back to the readers, and an introduction that mentions none of its
+        reader's titles (e.g. written for another reader) is dropped.
+        """
+        keys = [str(position) for position in range(1, len(readers) + 1)]
+        try:
+            response = self.get_completion(
+                messages=self._intro_batch_messages(readers, current_date),
+                temperature=0.7,
+                max_tokens=OUTPUT_TOKENS_PER_INTRO * len(readers),
+                response_format={"type": "json_object"},
+                validate=require_intro_keys(keys),
+            )
+            texts = parse_intro_batch(response.choices[0].message.content)
+        except Exception as e:
+            print(f"Error generating batched introductions: {e}")
+            return {}
+        intros = {}
+        for key, reader in zip(keys, readers):
+            titles = [_title_of(a) for a in reader["articles"][:INTRO_TITLES_PER_USER]]
+            if key in texts and mentions_titles(texts[key], titles):
+                intros[str(reader["key"])] = texts[key]
+        return intros
+
+    def generate_introductions(self, readers: List[Dict[str, Any]]) -> Dict[str, EmailIntroduction]:
+        """
+        Introductions for many readers (dicts with key, name and ranked articles)
+        in ceil(n / EMAIL_INTRO_BATCH_SIZE) requests, run in parallel. Greetings
+        are templated; readers missing from a response or whose introduction
+        does not match their titles, or all of them when EMAIL_INTRO_MODE=template,
+        get template_introduction. Returns {key: intro}.
+        """
+        current_date = datetime.now().strftime('%B %d, %Y')
+        texts: Dict[str, str] = {}
+        with_articles = [r for r in readers if r["articles"]]
+        if intro_mode() != "template" and with_articles:
+            size = max(1, INTRO_BATCH_SIZE)
+            batches = [with_articles[i:i + size] for i in range(0, len(with_articles), size)]
+            with ThreadPoolExecutor(max_workers=min(len(batches), llm_concurrency())) as pool:
+                for result in pool.map(lambda b: self._generate_intro_batch(b, current_date), batches):
+                    texts.update(result)
+
+        intros = {}
+        for reader in readers:
+            key = str(reader["key"])
+            if key in texts:
+                intros[key] = EmailIntroduction(
+                    greeting=default_greeting(reader["name"], current_date),
+                    introduction=texts[key],
+                )
+            else:
+                intros[key] = template_introduction(reader["name"], reader["articles"], current_date)
+        return intros
+
     def create_email_digest(self, ranked_articles: List[dict], limit: int = 10) -> EmailDigest:
         top_articles = ranked_articles[:limit]
         introduction = self.generate_introduction(top_articles)
@@ -132,9 +301,15 @@ OUTPUT JSON format:
             ranked_articles=top_articles
         )
     
-    def create_email_digest_response(self, ranked_articles: List[RankedArticleDetail], total_ranked: int, limit: int = 10) -> EmailDigestResponse:
+    def create_email_digest_response(
+        self,
+        ranked_articles: List[RankedArticleDetail],
+        total_ranked: int,
+        limit: int = 10,
+        introduction: Optional[EmailIntroduction] = None,
+    ) -> EmailDigestResponse:
         top_articles = ranked_articles[:limit]
-        introduction = self.generate_introduction(top_articles)
+        introduction = introduction or self.generate_introduction(top_articles)
         
         return EmailDigestResponse(
             introduction=introduction,
@@ -0,0 +1,299 @@
+"""
+Proactive rate limiting for Groq calls.
+
+Each API key gets a pair of token buckets: requests per minute and tokens per
+minute. A call takes one request plus its estimated tokens before it is sent;
+if either bucket is short it waits just long enough for the refill, instead of
+firing and backing off after a 429. Every response re-syncs the buckets from
+Groq's `x-ratelimit-*` headers, so the local model tracks the server's view.
+
+The buckets are shared process-wide (see `get_limiter`) and usable from both
+threads (`acquire`) and asyncio code (`acquire_async`). `KeyPool` schedules
+requests across every configured GROQ_API_KEY* by remaining headroom.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from .token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Free-tier defaults for llama-3.3-70b-versatile; headers override them at runtime.
+DEFAULT_RPM = 30
+DEFAULT_TPM = 12000
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset durations such as '7.66s', '2m59.56s' or '120ms' into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilling bucket: `capacity` units per `window` seconds."""
+
+    def __init__(self, capacity: float, window: float = 60.0):
+        self.capacity = float(capacity)
+        self.window = window
+        self.rate = self.capacity / window
+        self.level = self.capacity
+        self._stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A request larger than the bucket can only wait for a full bucket.
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], reset: Optional[float]) -> None:
+        """Adopt the server's numbers: `remaining` now, back to full after `reset` seconds."""
+        self._refill(time.monotonic())
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.capacity, float(remaining))
+        if reset and reset > 0 and self.level < self.capacity:
+            self.rate = (self.capacity - self.level) / reset
+        else:
+            self.rate = self.capacity / self.window
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one API key."""
+
+    def __init__(self, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._inflight_requests = 0
+        self._inflight_tokens = 0
+        self._lock = threading.Lock()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def _reserve(self, tokens: int) -> None:
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self._inflight_requests += 1
+        self._inflight_tokens += tokens
+
+    def headroom(self) -> float:
+        """Fraction of the tighter bucket that is currently available (0..1)."""
+        return min(
+            self.requests.level / self.requests.capacity,
+            self.tokens.level / self.tokens.capacity,
+        )
+
+    def _try_acquire(self, tokens: int) -> float:
+        with self._lock:
+            wait = self._wait_time(tokens, time.monotonic())
+            if wait <= 0:
+                self._reserve(tokens)
+            return wait
+
+    def acquire(self, tokens: int) -> None:
+        """Block the calling thread until one request and `tokens` tokens are available."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int) -> None:
+        """Like `acquire`, but yields to the event loop while waiting."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def complete(
+        self,
+        tokens: int,
+        headers: Optional[Mapping[str, str]] = None,
+        used_tokens: Optional[int] = None,
+    ) -> None:
+        """
+        Finish a call that reserved `tokens` via acquire. With `x-ratelimit-*`
+        headers the buckets adopt the server's remaining quota (less whatever
+        other calls still have reserved); otherwise the estimate is corrected
+        by the reported usage.
+        """
+        with self._lock:
+            self._inflight_requests -= 1
+            self._inflight_tokens -= tokens
+            if headers and any(k.lower().startswith("x-ratelimit-") for k in headers):
+                self._sync(headers)
+            elif used_tokens is not None:
+                self.tokens.level = min(self.tokens.capacity, self.tokens.level + tokens - used_tokens)
+
+    def _sync(self, headers: Mapping[str, str]) -> None:
+        def num(name: str) -> Optional[float]:
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+
+        # Groq reports requests per *day* and tokens per minute. The daily
+        # request budget only constrains us once fewer than a minute's worth
+        # are left; then the remainder is spread over the time to reset.
+        remaining_requests = num("x-ratelimit-remaining-requests")
+        if remaining_requests is not None and remaining_requests < self.requests.capacity:
+            self.requests.sync(
+                None,
+                remaining_requests - self._inflight_requests,
+                parse_reset(headers.get("x-ratelimit-reset-requests")),
+            )
+        elif remaining_requests is not None:
+            self.requests.rate = self.requests.capacity / self.requests.window
+        remaining_tokens = num("x-ratelimit-remaining-tokens")
+        self.tokens.sync(
+            num("x-ratelimit-limit-tokens"),
+            None if remaining_tokens is None else remaining_tokens - self._inflight_tokens,
+            parse_reset(headers.get("x-ratelimit-reset-tokens")),
+        )
+
+    def penalize(self, retry_after: Optional[float]) -> None:
+        """After a 429, hold both buckets empty until `retry_after` seconds have passed."""
+        delay = retry_after if retry_after and retry_after > 0 else 1.0
+        logger.warning(f"Rate limited by Groq; holding requests for {delay:.1f}s")
+        with self._lock:
+            for bucket in (self.requests, self.tokens):
+                bucket._refill(time.monotonic())
+                bucket.level = -bucket.rate * delay
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(api_key: str) -> RateLimiter:
+    """Process-wide limiter for `api_key` (GROQ_RPM / GROQ_TPM set the starting quotas)."""
+    with _limiters_lock:
+        limiter = _limiters.get(api_key)
+        if limiter is None:
+            limiter = RateLimiter(
+                rpm=int(os.getenv("GROQ_RPM", DEFAULT_RPM)),
+                tpm=int(os.getenv("GROQ_TPM", DEFAULT_TPM)),
+            )
+            _limiters[api_key] = limiter
+        return limiter
+
+
+def discover_api_keys() -> List[str]:
+    """
+    Every non-empty GROQ_API_KEY* variable: GROQ_API_KEY first, then GROQ_API_KEY2,
+    GROQ_API_KEY3, ... in numeric order. Duplicate values are used once.
+    """
+    named = []
+    for name, value in os.environ.items():
+        match = re.fullmatch(r"GROQ_API_KEY(\d*)", name)
+        if match and value.strip():
+            named.append((int(match.group(1) or 1), name, value.strip()))
+    keys: List[str] = []
+    for _, _, value in sorted(named):
+        if value not in keys:
+            keys.append(value)
+    return keys
+
+
+class KeyPool:
+    """
+    Process-wide scheduler over several API keys. Each request goes to the key
+    that can serve it soonest, ties broken by the most remaining quota, so load
+    spreads across keys and throughput grows with the number of keys.
+    """
+
+    def __init__(self, keys: List[str]):
+        self.keys = list(keys)
+        self.limiters = {key: get_limiter(key) for key in self.keys}
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int) -> Tuple[Optional[str], float]:
+        with self._lock:
+            now = time.monotonic()
+            best, best_rank = None, None
+            for key in self.keys:
+                limiter = self.limiters[key]
+                with limiter._lock:
+                    rank = (limiter._wait_time(tokens, now), -limiter.headroom())
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = key, rank
+            wait = best_rank[0]
+            if wait > 0:
+                return None, wait
+            limiter = self.limiters[best]
+            with limiter._lock:
+                limiter._reserve(tokens)
+            return best, 0.0
+
+    def acquire(self, tokens: int) -> str:
+        """Reserve one request and `tokens` tokens on the best key, blocking if all are spent."""
+        while True:
+            key, wait = self._try_acquire(tokens)
+            if key is not None:
+                return key
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int) -> str:
+        while True:
+            key, wait = self._try_acquire(tokens)
+            if key is not None:
+                return key
+            await asyncio.sleep(wait)
+
+    def complete(self, key: str, tokens: int, headers=None, used_tokens: Optional[int] = None) -> None:
+        self.limiters[key].complete(tokens, headers, used_tokens)
+
+    def penalize(self, key: str, retry_after: Optional[float]) -> None:
+        self.limiters[key].penalize(retry_after)
+
+
+_pool: Optional[KeyPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_key_pool() -> KeyPool:
+    """The shared pool over discover_api_keys(); raises ValueError if there are none."""
+    global _pool
+    keys = discover_api_keys()
+    if not keys:
+        raise ValueError("No GROQ_API_KEY* found in environment.")
+    with _pool_lock:
+        if _pool is None or _pool.keys != keys:
+            _pool = KeyPool(keys)
+        return _pool
+
+
+def estimate_tokens(messages, max_tokens: Optional[int] = None) -> int:
+    """Prompt + completion token estimate used to reserve quota (see token_budget.count_tokens)."""
+    # ~4 tokens of chat framing per message
+    prompt = sum(count_tokens(m.get("content") or "") + 4 for m in messages)
+    return prompt + (max_tokens or 1024)
@@ -0,0 +1,154 @@
+"""
+Persistent cache of chat completions, keyed by a hash of the request.
+
+Reruns after a crash, manual /run-digest triggers and the standalone scripts
+send byte-identical prompts; with the cache they are answered from the
+`llm_cache` table instead of the API. Entries expire after LLM_CACHE_TTL_HOURS
+(default 72) and the table is trimmed to LLM_CACHE_MAX_ENTRIES (default 5000)
+least-recently-used rows. Set LLM_CACHE=false to disable it, or pass
+`cache=False` to get_completion for calls whose output should not be reused.
+Callers can pass `validate` so that unparseable responses are never stored.
+
+Cache errors are logged and otherwise ignored: a broken cache never fails a call.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from openai.types.chat import ChatCompletion
+
+from app.database.models import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Trim the table every this many writes rather than on every write.
+EVICT_EVERY = 50
+# A hit only refreshes last_used_at when it is older than this, so reruns read
+# without writing (worker-thread writes contend with the pipeline's writer
+# session on SQLite). Hour granularity is plenty for LRU eviction.
+TOUCH_INTERVAL = timedelta(hours=1)
+
+
+def cache_enabled() -> bool:
+    return os.getenv("LLM_CACHE", "true").strip().lower() not in ("0", "false", "no")
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], **params) -> str:
+    """sha256 over the model, messages and every request parameter (temperature, response_format, ...)."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, session_factory, ttl_hours: Optional[float] = None, max_entries: Optional[int] = None):
+        self.session_factory = session_factory
+        self.ttl = timedelta(hours=ttl_hours or float(os.getenv("LLM_CACHE_TTL_HOURS", "72")))
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[ChatCompletion]:
+        session = self.session_factory()
+        try:
+            entry = session.get(LLMCacheEntry, key)
+            if entry is None:
+                return None
+            now = datetime.utcnow()
+            if entry.expires_at <= now:
+                # Left for evict() to delete; a read never waits on a write lock.
+                return None
+            response = ChatCompletion.model_validate_json(entry.response)
+        except Exception as e:
+            session.rollback()
+            session.close()
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+        try:
+            if entry.last_used_at is None or now - entry.last_used_at >= TOUCH_INTERVAL:
+                entry.last_used_at = now
+                session.commit()
+        except Exception as e:
+            # A busy database only delays the LRU update; the hit still counts.
+            session.rollback()
+            logger.debug(f"LLM cache touch skipped: {e}")
+        finally:
+            session.close()
+        return response
+
+    def set(self, key: str, model: str, response: ChatCompletion) -> None:
+        session = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            session.merge(LLMCacheEntry(
+                key=key,
+                model=model,
+                response=response.model_dump_json(),
+                created_at=now,
+                expires_at=now + self.ttl,
+                last_used_at=now,
+            ))
+            session.commit()
+            with self._lock:
+                self._writes += 1
+                evict = self._writes % EVICT_EVERY == 1
+            if evict:
+                self.evict(session)
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"LLM cache write failed: {e}")
+        finally:
+            session.close()
+
+    def evict(self, session) -> int:
+        """Drop expired rows, then the least recently used beyond max_entries."""
+        removed = (
+            session.query(LLMCacheEntry)
+            .filter(LLMCacheEntry.expires_at <= datetime.utcnow())
+            .delete(synchronize_session=False)
+        )
+        overflow = session.query(LLMCacheEntry).count() - self.max_entries
+        if overflow > 0:
+            oldest = (
+                session.query(LLMCacheEntry.key)
+                .order_by(LLMCacheEntry.last_used_at.asc())
+                .limit(overflow)
+                .subquery()
+            )
+            removed += (
+                session.query(LLMCacheEntry)
+                .filter(LLMCacheEntry.key.in_(oldest.select()))
+                .delete(synchronize_session=False)
+            )
+        session.commit()
+        return removed
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache, or None when LLM_CACHE is off."""
+    global _cache
+    if not cache_enabled():
+        return None
+    if _cache is None:
+        # Imported here so agents don't open a database engine until a cached call is made.
+        from app.database.connection import SessionLocal, engine
+
+        try:
+            LLMCacheEntry.__table__.create(bind=engine, checkfirst=True)
+        except Exception as e:
+            logger.warning(f"LLM cache unavailable: {e}")
+            return None
+        _cache = ResponseCache(SessionLocal)
+    return _cache
@@ -0,0 +1,152 @@
+"""
+Token counting and prompt budgeting without a network tokenizer.
+
+`count_tokens` approximates a BPE tokenizer (Llama 3 / tiktoken style): common
+words are one token, long words split every ~5 characters, digits go in groups
+of three and every punctuation mark or newline run costs one. It is an
+estimate, not an exact count, but it follows real token counts far more closely
+than a flat characters-per-token ratio (code, URLs and numbers included), which
+is enough to size prompts to a budget and to reserve rate-limit quota.
+
+`truncate_to_tokens` shrinks long content to a budget while keeping its shape:
+whole sections/paragraphs from the start and the end (the intro and the
+conclusion carry most of the signal), with a marker where the middle was cut.
+`fit_to_budget` shares one budget across many texts, e.g. the digests packed
+into a single ranking prompt.
+"""
+
+import math
+import re
+from typing import List, Tuple
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|\n+|[^\sA-Za-z\d]")
+# Blank lines, or a newline before a markdown heading, start a new section.
+_SECTION_BREAK = re.compile(r"\n\s*\n|\n(?=#{1,6} )")
+
+TRUNCATION_MARKER = "\n\n[...]\n\n"
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    total = 0
+    for piece in _PIECE.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            total += 1 if len(piece) <= 6 else math.ceil(len(piece) / 5)
+        elif first.isdigit():
+            total += math.ceil(len(piece) / 3)
+        else:
+            total += 1
+    return total
+
+
+def _cut_chars(text: str, budget: int, from_end: bool = False) -> str:
+    """Longest prefix (or suffix) of `text` within `budget` tokens, by binary search on length."""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        piece = text[-mid:] if from_end else text[:mid]
+        if count_tokens(piece) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    if not low:
+        return ""
+    return text[-low:] if from_end else text[:low]
+
+
+def _cut_words(text: str, budget: int, from_end: bool = False) -> str:
+    """
+    Longest word-aligned prefix (or suffix) of `text` within `budget` tokens. A
+    "word" that could never fit on its own (CJK text, minified code, encoded
+    blobs, long URLs) is cut at character level to fill the rest of the budget.
+    """
+    words = text.split(" ")
+    if from_end:
+        words.reverse()
+    kept, used = [], 0
+    for word in words:
+        cost = count_tokens(word)
+        if used + cost > budget:
+            if cost > budget:
+                partial = _cut_chars(word, budget - used, from_end=from_end)
+                if partial:
+                    kept.append(partial)
+            break
+        kept.append(word)
+        used += cost
+    if from_end:
+        kept.reverse()
+    return " ".join(kept)
+
+
+def _split_sections(text: str) -> List[str]:
+    return [s for s in _SECTION_BREAK.split(text) if s.strip()]
+
+
+def _take_sections(sections: List[str], budget: int, from_end: bool = False) -> Tuple[List[str], int, int]:
+    """Whole sections while they fit, then a word-aligned piece of the next one."""
+    ordered = list(reversed(sections)) if from_end else sections
+    kept, used = [], 0
+    for section in ordered:
+        cost = count_tokens(section) + 1  # plus the blank line joining sections
+        if used + cost > budget:
+            partial = _cut_words(section, budget - used - 1, from_end=from_end)
+            if partial:
+                kept.append(partial)
+                used += count_tokens(partial) + 1
+            break
+        kept.append(section)
+        used += cost
+    consumed = len(kept)
+    if from_end:
+        kept.reverse()
+    return kept, used, consumed
+
+
+def truncate_to_tokens(text: str, budget: int, head_ratio: float = 0.7) -> str:
+    """
+    Fit `text` into `budget` tokens. Short text is returned unchanged; otherwise
+    `head_ratio` of the budget is filled with leading sections and the rest with
+    trailing ones, cutting inside a section only at a word boundary.
+    """
+    if not text or count_tokens(text) <= budget:
+        return text or ""
+    budget = max(0, budget - count_tokens(TRUNCATION_MARKER))
+    sections = _split_sections(text)
+
+    if budget < 4 * count_tokens(TRUNCATION_MARKER):
+        return _cut_words(sections[0], budget) if sections else ""
+
+    head, used, consumed = _take_sections(sections, int(budget * head_ratio))
+    rest = sections[consumed:]
+    if not rest:
+        # One long section (e.g. a transcript with no paragraph breaks): its end
+        # is cut at word level too, which cannot overlap since the whole text
+        # is over budget.
+        tail = [_cut_words(sections[-1], budget - used, from_end=True)]
+    else:
+        # Unused head budget goes to the tail.
+        tail, _, _ = _take_sections(rest, budget - used, from_end=True)
+    return "\n\n".join(head) + TRUNCATION_MARKER + "\n\n".join(tail)
+
+
+def fit_to_budget(texts: List[str], budget: int) -> List[str]:
+    """
+    Share `budget` tokens across several texts: texts below the fair share keep
+    their full length and the leftover is split evenly among the longer ones,
+    which are then truncated with `truncate_to_tokens`.
+    """
+    costs = [count_tokens(t) for t in texts]
+    if sum(costs) <= budget:
+        return list(texts)
+    remaining, pending = budget, sorted(range(len(texts)), key=lambda i: costs[i])
+    share = 0
+    while pending:
+        share = remaining // len(pending)
+        if costs[pending[0]] > share:
+            break
+        remaining -= costs[pending.pop(0)]
+    long_ones = set(pending)
+    return [truncate_to_tokens(t, share) if i in long_ones else t for i, t in enumerate(texts)]
@@ -1,6 +1,6 @@
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
 from app.runner import run_scrapers
@@ -11,6 +11,7 @@ from app.services.process_email import send_digest_email
 from app.database.models import Base
 from app.database.connection import engine
 from app.database.repository import Repository
+from app.services.pipeline_events import PipelineEventLog
 
 load_dotenv()
 
@@ -53,16 +54,43 @@ def _maybe_run_instagram_autopost(log_progress) -> None:
         if r.returncode != 0:
             tail = (r.stderr or r.stdout or "")[-2500:]
             logger.error("Instagram autopost failed (exit %s): %s", r.returncode, tail)
-            log_progress("Instagram autopost failed — see logs")
+            log_progress("Instagram autopost failed — see logs", level="ERROR")
         else:
             logger.info("Instagram autopost finished OK")
             log_progress("Instagram post published")
     except subprocess.TimeoutExpired:
         logger.error("Instagram autopost timed out")
-        log_progress("Instagram autopost timed out")
+        log_progress("Instagram autopost timed out", level="ERROR")
     except Exception as e:
         logger.error("Instagram autopost error: %s", e)
-        log_progress(f"Instagram autopost error: {e}")
+        log_progress(f"Instagram autopost error: {e}", level="ERROR")
+
+
+def _maybe_run_retention(log_progress) -> None:
+    """
+    If RETENTION_DAYS is set, archive rows older than that many days after the pipeline.
+    """
+    if not os.getenv("RETENTION_DAYS", "").strip():
+        return
+    from app.database.retention import run_retention
+
+    try:
+        archived = run_retention()
+        total = sum(archived.values())
+        log_progress(f"Retention: archived {total} rows past the horizon", **archived)
+    except Exception as e:
+        logger.error("Retention job failed: %s", e)
+        log_progress(f"Retention job failed: {e}", level="ERROR")
+
+
+def _digest_score_horizon(hours: int) -> timedelta:
+    """
+    How long stored curator scores are kept: DIGEST_SCORE_HORIZON_HOURS (default
+    168, the widest window any caller ranks over) or this run's window if wider.
+    A fixed horizon keeps a short run from pruning scores a longer one still needs.
+    """
+    horizon = int(os.getenv("DIGEST_SCORE_HORIZON_HOURS", "168"))
+    return timedelta(hours=max(horizon, hours))
 
 
 def _is_scrape_recent():
@@ -108,13 +136,13 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
         logger.error(f"Failed to create pipeline run record: {e}")
         run_id = None
 
-    def log_progress(msg: str):
+    events = PipelineEventLog(repo, run_id)
+
+    def log_progress(msg: str, stage: str = None, level: str = "INFO", **fields):
         logger.info(msg)
-        if run_id:
-            try:
-                repo.update_pipeline_run(run_id, log_entry=msg)
-            except Exception:
-                pass
+        if stage:
+            events.set_stage(stage)
+        events.emit(msg, level=level, **fields)
 
 
     try:
@@ -122,11 +150,11 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
         try:
             with engine.connect() as conn:
                 Base.metadata.create_all(engine)
-                log_progress("✓ Database tables verified/created")
-            from app.database.schema_migrations import ensure_image_url_columns
+                log_progress("✓ Database tables verified/created", stage="setup")
+            from app.database.schema_migrations import apply_schema_migrations
 
-            ensure_image_url_columns()
-            log_progress("✓ Schema migrations applied (image_url columns)")
+            apply_schema_migrations()
+            log_progress("✓ Schema migrations applied")
         except Exception as e:
             logger.error(f"Failed to create database tables: {e}")
             raise
@@ -134,9 +162,9 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
         if not force_scrape and _is_scrape_recent():
             logger.info("\n[1/5] Using cached scrape data (Last scrape < 60 mins ago). Skipping new checks.")
             results["scraping"] = {"status": "cached"}
-            log_progress("Using cached scrape data.")
+            log_progress("Using cached scrape data.", stage="scrape")
         else:
-            log_progress("\n[1/5] Scraping articles from sources...")
+            log_progress("\n[1/5] Scraping articles from sources...", stage="scrape")
             scraping_results = run_scrapers(hours=hours)
             results["scraping"] = {
                 "youtube": len(scraping_results.get("youtube", [])),
@@ -151,7 +179,7 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
             _update_last_scrape()
 
 
-        log_progress("\n[2/5] Processing Anthropic markdown...")
+        log_progress("\n[2/5] Processing Anthropic markdown...", stage="anthropic")
         anthropic_result = process_anthropic_markdown()
         results["processing"]["anthropic"] = anthropic_result
         logger.info(
@@ -159,7 +187,7 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
             f"({anthropic_result['failed']} failed)"
         )
 
-        log_progress("\n[3/5] Processing YouTube transcripts...")
+        log_progress("\n[3/5] Processing YouTube transcripts...", stage="youtube")
         youtube_result = process_youtube_transcripts()
         results["processing"]["youtube"] = youtube_result
         logger.info(
@@ -167,23 +195,39 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
             f"({youtube_result['unavailable']} unavailable)"
         )
 
-        log_progress("\n[4/5] Creating digests for articles...")
-        digest_result = process_digests()
+        log_progress("\n[4/5] Creating digests for articles...", stage="digest")
+        # Freshest, highest-weight items are digested first; with DIGEST_SKIP_STALE
+        # set, items older than the personalization window are left pending.
+        skip_stale = os.getenv("DIGEST_SKIP_STALE", "").strip().lower() in ("1", "true", "yes")
+        digest_result = process_digests(max_age_hours=hours if skip_stale else None)
         results["digests"] = digest_result
         logger.info(
             f"✓ Created {digest_result['processed']} digests "
             f"({digest_result['failed']} failed out of {digest_result['total']} total)"
         )
 
-        log_progress("\n[5/5] Generating personalized digests for users...")
+        log_progress("\n[5/5] Generating personalized digests for users...", stage="personalize")
         
-        # repo already initialized above
-        active_users = repo.get_active_users()
-        log_progress(f"Found {len(active_users)} active users")
+        digest_email_test_only = os.getenv("DIGEST_EMAIL_TEST_ONLY", "").strip().lower()
+
+        # Trial lifecycle: warnings, expiry emails and status updates as set operations
+        from app.services.trial_lifecycle import process_trial_lifecycle, trial_cutoff
+        trial_stats = process_trial_lifecycle(repo, start_time, email_filter=digest_email_test_only or None)
+        results["trial_lifecycle"] = trial_stats
+        log_progress(
+            f"Trial lifecycle: {trial_stats['warned_2'] + trial_stats['warned_1']} warnings, "
+            f"{trial_stats['expired_notified']} expiry emails, {trial_stats['expired']} newly expired",
+            **trial_stats,
+        )
+
+        # Only users still within their trial (or admins) are personalized
+        active_users = repo.get_active_users(trial_cutoff=trial_cutoff(start_time))
+        log_progress(f"Found {len(active_users)} eligible active users", active_users=len(active_users))
 
         if not active_users:
             logger.info("No active users found. Skipping personalization.")
         
+        from app.agent.base import run_limited
         from app.agent.curator_agent import CuratorAgent
         from app.services.process_email import send_personalized_email
         from app.services.user_service import UserService
@@ -195,73 +239,30 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
         if not recent_digests:
              logger.info("No digests available to rank.")
              results["user_digests"] = 0
+             events.flush()
              return results
 
+        # Seen-sets for every active user, restricted to this window, in one query
+        seen_by_user = repo.get_seen_digest_ids_for_active_users([d["id"] for d in recent_digests])
+
         user_count = 0
         email_count = 0
-        digest_email_test_only = os.getenv("DIGEST_EMAIL_TEST_ONLY", "").strip().lower()
         if digest_email_test_only:
             log_progress(f"⚠ DIGEST_EMAIL_TEST_ONLY set — personalization runs only for {digest_email_test_only}")
 
+        # Pass 1 (single DB session): per-user bookkeeping and unseen candidates
+        jobs = []
         for user in active_users:
             try:
                 if digest_email_test_only and user.email.strip().lower() != digest_email_test_only:
                     continue
-                # --- Trial Expiration Check (27 Days) ---
-                if user.role != "admin": # Admins are immune
-                    # Ensure timezone awareness compatibility
-                    created_at = user.created_at
-                    
-                    if created_at is None:
-                        logger.warning(f"User {user.email} has NULL created_at. defaulting to 0 days active.")
-                        days_active = 0
-                    else:
-                        if created_at.tzinfo is None:
-                            created_at = created_at.replace(tzinfo=timezone.utc)
-                        days_active = (start_time - created_at).days
-                    
-                    trial_limit = 27
-                    days_left = trial_limit - days_active
-                    
-                    if days_left == 2 and str(user.trial_warning_2_sent).lower() != "true":
-                        from app.services.process_email import send_trial_warning_email
-                        logger.info(f"User {user.email} has 2 days left on trial. Sending warning email.")
-                        if send_trial_warning_email(user, days_left):
-                            user.trial_warning_2_sent = "true"
-                            repo.session.commit()
-                    
-                    elif days_left == 1 and str(user.trial_warning_1_sent).lower() != "true":
-                        from app.services.process_email import send_trial_warning_email
-                        logger.info(f"User {user.email} has 1 day left on trial. Sending warning email.")
-                        if send_trial_warning_email(user, days_left):
-                            user.trial_warning_1_sent = "true"
-                            repo.session.commit()
-                    
-                    # STRICT 27-day limit
-                    if days_active >= trial_limit:
-                         if str(user.trial_expired_sent).lower() != "true":
-                             from app.services.process_email import send_trial_expired_email
-                             logger.info(f"User {user.email} trial expired. Sending expiration email.")
-                             if send_trial_expired_email(user):
-                                 user.trial_expired_sent = "true"
-                                 repo.session.commit()
-
-                         msg = f"User {user.email} trial expired ({days_active} days >= {trial_limit}). Marking expired & skipping."
-                         logger.info(msg)
-                         log_progress(msg)
-                         
-                         # Update DB status
-                         repo.update_user_status(user.id, "expired")
-                         continue
-                # ----------------------------------------
-
                 user_count += 1
                 if run_id:
                      repo.update_pipeline_run(run_id, users_processed=user_count)
                 
                 msg = f"--- Processing for user: {user.name} ({user.email}) ---"
                 logger.info(msg)
-                log_progress(msg)
+                log_progress(msg, user_id=user.id)
 
                 # Refresh user from DB to get latest flags (prevents stale data)
                 repo.session.refresh(user)
@@ -282,8 +283,8 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
                 user_profile = user_service.get_user_profile(user)
                 
                 # 1.5 Filter out already seen digests
-                seen_digest_ids = set(repo.get_user_recommended_digest_ids(user.id))
-                logger.info(f"User {user.name} has {len(seen_digest_ids)} previously recommended digests")
+                seen_digest_ids = seen_by_user.get(user.id, set())
+                logger.info(f"User {user.name} has {len(seen_digest_ids)} previously recommended digests in this window")
                 logger.debug(f"Seen IDs sample: {list(seen_digest_ids)[:5] if seen_digest_ids else []}")
                 
                 unseen_digests = [d for d in recent_digests if d['id'] not in seen_digest_ids]
@@ -292,15 +293,85 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
                     msg = f"No new digests for {user.name} (All {len(recent_digests)} recent items already recommended). Skipping."
                     logger.info(msg)
                     log_progress(msg)
-                    import time; time.sleep(0.5) # Small sleep to avoid instant loops looking like bugs
                     continue
                 
                 logger.info(f"Ranking {len(unseen_digests)} new digests for {user.name} (out of {len(recent_digests)} total recent)...")
+                jobs.append((user, user_profile, unseen_digests))
+
+            except Exception as e:
+                logger.error(f"Error processing for user {user.email}: {e}")
+                events.emit(f"Error processing for user {user.email}: {e}", level="ERROR", user_id=user.id)
+
+        # Scores from earlier runs: each digest is sent to the curator once per user.
+        stored_scores = repo.get_digest_scores(
+            [user.id for user, _, _ in jobs], [d["id"] for d in recent_digests]
+        )
+
+        # Users with the same title, interests, expertise and config flags form a
+        # cohort that is ranked once, over the union of its members' not yet
+        # scored candidates.
+        from app.services.cohorts import group_into_cohorts, ranking_for_member
+        cohorts = group_into_cohorts(jobs, stored_scores)
+
+        # Local TF-IDF prefilter: one affinity matrix for every cohort, then only
+        # its top-K candidates go to the LLM curator.
+        if cohorts:
+            from app.services.relevance import prefilter_candidates
+            shortlists = prefilter_candidates(
+                recent_digests,
+                [c["profile"] for c in cohorts],
+                [c["candidates"] for c in cohorts],
+            )
+            trimmed = sum(len(c["candidates"]) - len(s) for c, s in zip(cohorts, shortlists))
+            if trimmed:
+                log_progress(f"Relevance prefilter dropped {trimmed} low-affinity candidates across {len(cohorts)} cohorts")
+            for cohort, shortlist in zip(cohorts, shortlists):
+                cohort["candidates"] = shortlist
+
+        # Pass 2: rank each cohort's new candidates once, concurrently. The
+        # shared Groq token bucket paces the calls to the RPM/TPM quota, so no
+        # fixed sleeps are needed. Members merge the fresh ranking of their
+        # unseen digests with their stored scores.
+        rankings = [None] * len(jobs)
+        if cohorts:
+            to_rank = [c for c in cohorts if c["candidates"]]
+            log_progress(
+                f"Ranking {sum(len(c['candidates']) for c in to_rank)} new candidates for {len(jobs)} users "
+                f"in {len(to_rank)} profile cohorts concurrently...",
+                users=len(jobs), cohorts=len(to_rank),
+            )
+            fresh = dict(zip(map(id, to_rank), run_limited(
+                CuratorAgent(cohort["profile"]).arank_digests(cohort["candidates"])
+                for cohort in to_rank
+            )))
+            new_scores = []
+            for cohort in cohorts:
+                ranked = fresh.get(id(cohort), [])
+                for member in cohort["members"]:
+                    user, _, unseen_digests = jobs[member]
+                    if isinstance(ranked, Exception):
+                        rankings[member] = ranked
+                        continue
+                    stored = stored_scores.get(user.id, {})
+                    unseen_ids = {d["id"] for d in unseen_digests}
+                    new_scores.extend(
+                        {"user_id": user.id, "digest_id": a.digest_id,
+                         "relevance_score": a.relevance_score, "reasoning": a.reasoning,
+                         "score_pass": a.score_pass}
+                        for a in ranked
+                        if a.digest_id in unseen_ids and a.digest_id not in stored
+                    )
+                    rankings[member] = ranking_for_member(ranked, unseen_digests, stored)
+            repo.save_digest_scores(new_scores)
+            repo.delete_digest_scores_before(start_time - _digest_score_horizon(hours))
+
+        # Pass 3 (single DB session): save recommendations
+        to_send = []
+        for (user, user_profile, unseen_digests), ranked_articles in zip(jobs, rankings):
+            try:
+                if isinstance(ranked_articles, Exception):
+                    raise ranked_articles
 
-                # 2. Rank Content
-                curator = CuratorAgent(user_profile)
-                ranked_articles = curator.rank_digests(unseen_digests)
-                
                 if not ranked_articles:
                     msg = f"No relevant articles found for {user.name} in new batch. Skipping."
                     logger.info(msg)
@@ -309,42 +380,10 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
 
                 # 3. Save Recommendations
                 top_articles = ranked_articles[:top_n]
-                new_recommendations = []
-                final_articles_to_send = []
-
-                for article in top_articles:
-                    # Check if already recommended *before* creating call to avoid DB hit?
-                    # Repo handle check inside. We need to know if it was created NOW or existed.
-                    # Let's modify logic: check existence first? 
-                    # Simpler: Repo returns the object. We can assume if we are running daily, we only want to notify about stuff created in this run?
-                    # Or we check if the recommendation is 'fresh'.
-                    
-                    # Workaround: Check repo for existence manually or modify repo. 
-                    # Let's rely on exclude_sent=False fetching OLD digests, so existing recs exist.
-                    
-                    rec = repo.create_recommendation(
-                        user_id=user.id,
-                        digest_id=article.digest_id,
-                        relevance_score=article.relevance_score,
-                        rank=article.rank,
-                        reasoning=article.reasoning
-                    )
-                    
-                    # If the recommendation was just created, its created_at would be very close to now.
-                    # But reliable way: repo.create_recommendation could return a flag?
-                    # Let's assume for this fix: We only send articles if they haven't been recommended before.
-                    # Since create_recommendation handles idempotency, we can check if it was 'newly' made.
-                    # Hack: Check if rec.created_at > start_time
-                    
-                    if not rec:
-                        logger.warning(f"Skipping invalid digest recommendation: {article.digest_id}")
-                        continue
-
-                    if rec.created_at >= start_time.replace(tzinfo=rec.created_at.tzinfo):
-                        new_recommendations.append(rec)
-                        final_articles_to_send.append(article)
+                new_digest_ids = set(repo.save_recommendations(user.id, top_articles))
+                final_articles_to_send = [a for a in top_articles if a.digest_id in new_digest_ids]
                 
-                logger.info(f"Saved {len(new_recommendations)} NEW recommendations for {user.name}")
+                logger.info(f"Saved {len(final_articles_to_send)} NEW recommendations for {user.name}")
 
                 if not final_articles_to_send:
                      msg = f"No new recommendations for {user.name}. Skipping email."
@@ -352,38 +391,66 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10, force_scrape: bool = Fa
                      log_progress(msg)
                      continue
 
+                to_send.append((user, user_profile, final_articles_to_send))
+
+            except Exception as e:
+                logger.error(f"Error processing for user {user.email}: {e}")
+                events.emit(f"Error processing for user {user.email}: {e}", level="ERROR", user_id=user.id)
+
+        # Pass 4: introductions for every recipient in a few batched requests
+        # (or templated, with EMAIL_INTRO_MODE=template), then send the emails.
+        introductions = {}
+        if to_send:
+            from app.agent.email_agent import EmailAgent
+            digest_titles = {d["id"]: d["title"] for d in recent_digests}
+            try:
+                introductions = EmailAgent().generate_introductions([
+                    {
+                        "key": user.id,
+                        "name": user_profile["name"],
+                        "articles": [{"title": digest_titles.get(a.digest_id, "N/A")} for a in articles],
+                    }
+                    for user, user_profile, articles in to_send
+                ])
+            except Exception as e:
+                logger.error(f"Error generating email introductions: {e}")
+
+        for user, user_profile, final_articles_to_send in to_send:
+            try:
                 # 4. Send Email
-                # We need to adapt send_digest_email to take a user object and list of recommendations
-                email_result = send_personalized_email(user, user_profile, final_articles_to_send)
+                email_result = send_personalized_email(
+                    user, user_profile, final_articles_to_send, introductions.get(user.id)
+                )
                 
                 if email_result["success"]:
                     email_count += 1
-                    log_progress(f"✓ Email sent to {user.email}")
+                    log_progress(f"✓ Email sent to {user.email}", user_id=user.id, articles=email_result.get("articles_count"))
                 else:
                     logger.error(f"✗ Failed to send email to {user.email}: {email_result.get('error')}")
 
             except Exception as e:
                 logger.error(f"Error processing for user {user.email}: {e}")
-            
-            # Rate Limit Protection (Groq has RPM limits)
-            # Increased to 10s to stay safely below 30 RPM (approx 6 RPM)
-            import time
-            logger.info("Sleeping 10s to respect Groq Rate Limits...")
-            time.sleep(10)
+                events.emit(f"Error processing for user {user.email}: {e}", level="ERROR", user_id=user.id)
         
         results["user_digests"] = user_count
         results["emails_sent"] = email_count
         results["success"] = True
 
+        events.set_stage("publish")
         _maybe_run_instagram_autopost(log_progress)
+        _maybe_run_retention(log_progress)
 
+        events.emit("Pipeline finished successfully.")
+        events.flush()
         if run_id:
-            repo.update_pipeline_run(run_id, status="SUCCESS", log_entry="Pipeline finished successfully.")
+            repo.update_pipeline_run(run_id, status="SUCCESS")
 
     except Exception as e:
         logger.error(f"Pipeline failed with error: {e}", exc_info=True)
+        events.emit(f"Error: {str(e)}", level="ERROR")
+        events.flush()
         if run_id:
-            repo.update_pipeline_run(run_id, status="FAILED", log_entry=f"Error: {str(e)}")
+            repo.update_pipeline_run(run_id, status="FAILED")
         results["error"] = str(e)
 
     end_time = datetime.now(timezone.utc)
@@ -409,10 +476,10 @@ if __name__ == "__main__":
     # Ensure tables exists
     from app.database.models import Base
     from app.database.connection import engine
-    from app.database.schema_migrations import ensure_image_url_columns
+    from app.database.schema_migrations import apply_schema_migrations
 
     Base.metadata.create_all(engine)
-    ensure_image_url_columns()
+    apply_schema_migrations()
 
     result = run_daily_pipeline(hours=72, top_n=10)  # 72 hours for demo
     exit(0 if result.get("success", True) else 1)
@@ -0,0 +1,41 @@
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from .repository import Repository
+
+
+class AsyncRepository:
+    """
+    Non-blocking read access for the FastAPI endpoints.
+
+    Each method runs the matching sync `Repository` query through
+    `AsyncSession.run_sync`, so the query logic lives in one place while the
+    I/O goes through the async driver and never occupies a threadpool slot.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.session.run_sync(lambda s: fn(Repository(s), *args, **kwargs))
+
+    async def get_latest_pipeline_run(self) -> Optional[Dict[str, Any]]:
+        return await self._run(Repository.get_latest_pipeline_run)
+
+    async def get_pipeline_events(
+        self, run_id: str, after_seq: int = 0, limit: int = 500
+    ) -> List[Dict[str, Any]]:
+        return await self._run(
+            Repository.get_pipeline_events, run_id, after_seq=after_seq, limit=limit
+        )
+
+    async def search_digests(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        return await self._run(Repository.search_digests, query, limit=limit, offset=offset)
+
+    async def get_user_feed_page(
+        self, user_id: str, limit: int = 20, cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return await self._run(
+            Repository.get_user_feed_page, user_id, limit=limit, cursor=cursor
+        )
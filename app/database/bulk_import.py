@@ -0,0 +1,199 @@
+"""
+Bulk backfill importer for the source tables.
+
+Streams JSONL or CSV rows in chunks. On Postgres each chunk is COPY'd into a
+temporary staging table and merged with INSERT ... SELECT ... ON CONFLICT DO
+NOTHING; other databases fall back to an executemany insert. Existing rows are
+skipped, and new rows are mirrored into the `articles` read model.
+
+    python -m app.database.bulk_import youtube_videos videos.jsonl
+    python -m app.database.bulk_import general_rss_articles feed.csv --source techcrunch
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import DateTime
+
+from app.database.models import AnthropicArticle, GeneralRSSArticle, OpenAIArticle, YouTubeVideo
+from app.database.repository import Repository
+
+logger = logging.getLogger(__name__)
+
+IMPORT_MODELS = {
+    model.__tablename__: model
+    for model in (YouTubeVideo, OpenAIArticle, AnthropicArticle, GeneralRSSArticle)
+}
+CHUNK_SIZE = 5000
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield one dict per JSONL line or CSV record without loading the file."""
+    fmt = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _normalize(model, raw: Dict[str, Any], source: Optional[str], now: datetime) -> Dict[str, Any]:
+    """Keep known columns, turn blanks into NULL, parse datetimes and fill defaults."""
+    row = {}
+    for column in model.__table__.columns:
+        value = raw.get(column.name)
+        if value == "":
+            value = None
+        if value is not None and isinstance(column.type, DateTime) and isinstance(value, str):
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        row[column.name] = value
+
+    if model is GeneralRSSArticle:
+        row["source"] = row["source"] or source
+        if not row["source"]:
+            raise ValueError("general_rss_articles rows need a source (column or --source)")
+    if model is YouTubeVideo:
+        row["channel_id"] = row["channel_id"] or ""
+        row["image_url"] = row["image_url"] or f"https://i.ytimg.com/vi/{row['video_id']}/hqdefault.jpg"
+    if "description" in row and row["description"] is None:
+        row["description"] = ""
+    row["created_at"] = row["created_at"] or now
+    return row
+
+
+def _copy_text_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _merge_chunk_copy(repo: Repository, model, rows: List[Dict[str, Any]]) -> List[str]:
+    """Postgres: COPY into a transaction-scoped staging table, then merge into the target."""
+    table = model.__tablename__
+    pk = model.__table__.primary_key.columns.values()[0].name
+    columns = [c.name for c in model.__table__.columns]
+    col_list = ", ".join(columns)
+
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_text_value(row[c]) for c in columns) + "\n")
+    buf.seek(0)
+
+    dbapi_conn = repo.session.connection().connection
+    with dbapi_conn.cursor() as cur:
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS staging_{table} "
+            f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+        cur.copy_expert(f"COPY staging_{table} ({col_list}) FROM STDIN", buf)
+        cur.execute(
+            f"INSERT INTO {table} ({col_list}) SELECT {col_list} FROM staging_{table} "
+            f"ON CONFLICT ({pk}) DO NOTHING RETURNING {pk}"
+        )
+        return [r[0] for r in cur.fetchall()]
+
+
+def _merge_chunk_executemany(repo: Repository, model, rows: List[Dict[str, Any]]) -> List[str]:
+    # Core table + connection so SQLAlchemy batches the rows (insertmanyvalues).
+    pk_col = model.__table__.primary_key.columns.values()[0]
+    stmt = repo._insert_ignore(model.__table__).returning(pk_col)
+    return [r[0] for r in repo.session.connection().execute(stmt, rows)]
+
+
+def import_rows(
+    table: str,
+    rows: Iterator[Dict[str, Any]],
+    source: Optional[str] = None,
+    chunk_size: int = CHUNK_SIZE,
+    repo: Optional[Repository] = None,
+) -> Dict[str, Any]:
+    model = IMPORT_MODELS.get(table)
+    if model is None:
+        raise ValueError(f"Unsupported table {table!r}; expected one of {sorted(IMPORT_MODELS)}")
+    repo = repo or Repository()
+    use_copy = repo.session.get_bind().dialect.name == "postgresql"
+    merge = _merge_chunk_copy if use_copy else _merge_chunk_executemany
+    pk = model.__table__.primary_key.columns.values()[0].name
+
+    read = inserted = 0
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+
+    def flush(chunk: List[Dict[str, Any]]) -> None:
+        nonlocal inserted
+        try:
+            new_keys = set(merge(repo, model, chunk))
+            repo._add_articles(model, [r for r in chunk if r[pk] in new_keys])
+            repo.session.commit()
+        except Exception:
+            repo.session.rollback()
+            raise
+        inserted += len(new_keys)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        logger.info(
+            f"{table}: {read} rows read, {inserted} inserted "
+            f"({read / elapsed:,.0f} rows/s)"
+        )
+
+    chunk: List[Dict[str, Any]] = []
+    for raw in rows:
+        chunk.append(_normalize(model, raw, source, now))
+        read += 1
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    elapsed = time.monotonic() - started
+    return {
+        "table": table,
+        "read": read,
+        "inserted": inserted,
+        "skipped": read - inserted,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(read / elapsed, 1) if elapsed else None,
+        "method": "copy" if use_copy else "executemany",
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    parser = argparse.ArgumentParser(description="Bulk-load historical rows into a source table.")
+    parser.add_argument("table", choices=sorted(IMPORT_MODELS))
+    parser.add_argument("path", help="JSONL or CSV file")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None)
+    parser.add_argument("--source", default=None, help="RSS source name for general_rss_articles")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    result = import_rows(
+        args.table,
+        read_rows(args.path, args.format),
+        source=args.source,
+        chunk_size=args.chunk_size,
+    )
+    print(
+        f"Imported {result['inserted']} of {result['read']} rows into {result['table']} "
+        f"in {result['seconds']}s ({result['rows_per_second']} rows/s, {result['method']})"
+    )
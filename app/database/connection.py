@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
@@ -51,9 +52,43 @@ def get_database_info() -> dict:
     }
 
 
+def get_async_database_url() -> str:
+    """Same database as get_database_url(), addressed through an asyncio driver."""
+    url = make_url(get_database_url())
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+
+    # asyncpg takes `ssl` instead of libpq's `sslmode` and rejects other libpq-only options.
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode and sslmode != "disable":
+        query["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(
+        hide_password=False
+    )
+
+
 engine = create_engine(get_database_url())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_engine = None
+_AsyncSessionLocal = None
+
 
 def get_session():
     return SessionLocal()
+
+
+def get_async_session():
+    """
+    AsyncSession for the API's read endpoints. The async engine is created on first
+    use so scripts that only need the sync engine don't require the async driver.
+    """
+    global _async_engine, _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        _async_engine = create_async_engine(get_async_database_url(), pool_pre_ping=True)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _AsyncSessionLocal()
@@ -1,9 +1,9 @@
 from app.database.models import Base
 from app.database.connection import engine
-from app.database.schema_migrations import ensure_image_url_columns
+from app.database.schema_migrations import apply_schema_migrations
 
 if __name__ == "__main__":
     Base.metadata.create_all(engine)
-    ensure_image_url_columns()
+    apply_schema_migrations()
     print("Tables created successfully")
 
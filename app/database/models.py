@@ -1,10 +1,25 @@
+import hashlib
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import Column, String, DateTime, Text, Integer, BigInteger, Boolean, Float, LargeBinary, Index, UniqueConstraint
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
 
+def make_digest_key(digest_id: str) -> int:
+    """
+    Fixed-width surrogate for a digest's natural id ("{article_type}:{article_id}").
+    A signed 64-bit hash, so it fits BIGINT and can be computed without a lookup.
+    """
+    return int.from_bytes(
+        hashlib.blake2b(digest_id.encode("utf-8"), digest_size=8).digest(), "big", signed=True
+    )
+
+
+def _digest_key_default(column: str):
+    return lambda context: make_digest_key(context.get_current_parameters()[column])
+
+
 class YouTubeVideo(Base):
     __tablename__ = "youtube_videos"
 
@@ -60,17 +75,40 @@ class GeneralRSSArticle(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class Article(Base):
+    """
+    Unified read model over the four source tables, kept in sync by Repository on
+    insert/update. `id` matches the Digest id ("{article_type}:{source_id}").
+    """
+    __tablename__ = "articles"
+    __table_args__ = (
+        Index("ix_articles_pending", "digested", "has_content", "published_at"),
+    )
+
+    id = Column(String, primary_key=True)
+    article_type = Column(String, nullable=False, index=True)  # youtube, openai, anthropic or RSS source
+    source_id = Column(String, nullable=False)  # video_id / guid in the source table
+    title = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    image_url = Column(String, nullable=True)
+    published_at = Column(DateTime, nullable=False)
+    has_content = Column(Boolean, nullable=False, default=False)  # Ready to be digested
+    digested = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Digest(Base):
     __tablename__ = "digests"
 
-    id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True)  # Natural key, "{article_type}:{article_id}"
+    digest_key = Column(BigInteger, unique=True, default=_digest_key_default("id"))  # Join key
     article_type = Column(String, nullable=False)
     article_id = Column(String, nullable=False)
     url = Column(String, nullable=False)
     title = Column(String, nullable=False)
     summary = Column(Text, nullable=False)
     image_url = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     sent_at = Column(DateTime, nullable=True)
 
 
@@ -95,14 +133,44 @@ class User(Base):
 
 class Recommendation(Base):
     __tablename__ = "recommendations"
+    __table_args__ = (
+        UniqueConstraint("user_id", "digest_key", name="uq_recommendations_user_digest_key"),
+    )
 
     id = Column(String, primary_key=True)
     user_id = Column(String, nullable=False)
     digest_id = Column(String, nullable=False)
+    digest_key = Column(BigInteger, default=_digest_key_default("digest_id"))  # Digest.digest_key
     relevance_score = Column(String, nullable=False)  # Float stored as string
     rank = Column(String, nullable=False)  # Int stored as string
     reasoning = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Feed keyset columns: Digest.created_at copied at insert time and rank as an
+    # integer, so ix_recommendations_feed serves the feed order without a join.
+    digest_created_at = Column(DateTime, nullable=True)
+    rank_position = Column(Integer, nullable=True)
+
+
+Index(
+    "ix_recommendations_feed",
+    Recommendation.user_id,
+    Recommendation.digest_created_at.desc(),
+    Recommendation.rank_position,
+    Recommendation.id,
+)
+
+
+class DigestScore(Base):
+    """Curator relevance score for one (user, digest), so each digest is only ranked once per user."""
+    __tablename__ = "digest_scores"
+
+    user_id = Column(String, primary_key=True)
+    digest_key = Column(BigInteger, primary_key=True)  # Digest.digest_key
+    digest_id = Column(String, nullable=False)
+    relevance_score = Column(Float, nullable=False)
+    reasoning = Column(Text, nullable=True)
+    score_pass = Column(String, nullable=True)  # Curator call that produced the score: single, refine or chunk
+    scored_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
 class PipelineRun(Base):
@@ -115,3 +183,41 @@ class PipelineRun(Base):
     log_summary = Column(Text, default="")
     users_processed = Column(String, default="0")  # Int stored as string for consistency
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PipelineEvent(Base):
+    __tablename__ = "pipeline_events"
+
+    run_id = Column(String, primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)  # Monotonic per run
+    ts = Column(DateTime, nullable=False)
+    stage = Column(String, nullable=True)  # e.g. "scrape", "digest", "personalize"
+    level = Column(String, default="INFO")
+    message = Column(Text, nullable=False)
+    fields = Column(Text, nullable=True)  # JSON string of structured fields
+
+
+class ArchivedRow(Base):
+    __tablename__ = "archived_rows"
+    __table_args__ = (
+        Index("ix_archived_rows_table_bucket", "table_name", "bucket"),
+    )
+
+    table_name = Column(String, primary_key=True)  # Hot table the row came from
+    row_key = Column(String, primary_key=True)  # Primary key of the row, ":"-joined if composite
+    row_ts = Column(DateTime, nullable=True)  # Time column the retention horizon was applied to
+    bucket = Column(String, nullable=False)  # "YYYY-MM" of row_ts, for dropping whole months
+    payload = Column(LargeBinary, nullable=False)  # zlib-compressed JSON of the row
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LLMCacheEntry(Base):
+    """Cached chat completion, keyed by a hash of the request (see app/agent/response_cache.py)."""
+    __tablename__ = "llm_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of model + messages + parameters
+    model = Column(String, nullable=False)
+    response = Column(Text, nullable=False)  # ChatCompletion JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)  # LRU eviction order
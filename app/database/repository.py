@@ -1,8 +1,31 @@
+import base64
+import json
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any, Set
+from sqlalchemy import and_, bindparam, func, or_, update
 from sqlalchemy.orm import Session
-from .models import YouTubeVideo, OpenAIArticle, AnthropicArticle, GeneralRSSArticle, Digest, User, Recommendation, PipelineRun
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import YouTubeVideo, OpenAIArticle, AnthropicArticle, GeneralRSSArticle, Digest, DigestScore, User, Recommendation, PipelineRun, PipelineEvent, Article, make_digest_key
 from .connection import get_session
+from . import search
+
+
+# Stored in youtube_videos.transcript when no transcript can be fetched.
+TRANSCRIPT_UNAVAILABLE = "__UNAVAILABLE__"
+
+
+def _encode_feed_cursor(created_at: datetime, rank: int, rec_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), rank, rec_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_feed_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, rank, rec_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(rank), str(rec_id)
+    except Exception as e:
+        raise ValueError(f"Invalid feed cursor: {cursor!r}") from e
 
 
 class Repository:
@@ -24,12 +47,66 @@ class Repository:
                 .first()
             )
             if not existing:
-                new_items.append(model_class(**item))
+                new_items.append(item)
         if new_items:
-            self.session.add_all(new_items)
+            self.session.add_all([model_class(**item) for item in new_items])
+            self._add_articles(model_class, new_items)
             self.session.commit()
         return len(new_items)
 
+    def _add_articles(self, model_class, items: List[dict]) -> None:
+        """Mirror newly inserted source rows into the unified `articles` read model."""
+        rows = []
+        for item in items:
+            if model_class is YouTubeVideo:
+                article_type, source_id = "youtube", item["video_id"]
+                transcript = item.get("transcript")
+                has_content = bool(transcript) and transcript != TRANSCRIPT_UNAVAILABLE
+            elif model_class is OpenAIArticle:
+                article_type, source_id, has_content = "openai", item["guid"], True
+            elif model_class is AnthropicArticle:
+                article_type, source_id = "anthropic", item["guid"]
+                has_content = bool(item.get("markdown"))
+            else:
+                article_type, source_id, has_content = item["source"], item["guid"], True
+            rows.append(
+                {
+                    "id": f"{article_type}:{source_id}",
+                    "article_type": article_type,
+                    "source_id": source_id,
+                    "title": item["title"],
+                    "url": item["url"],
+                    "image_url": item.get("image_url"),
+                    "published_at": item["published_at"],
+                    "has_content": has_content,
+                    "digested": False,
+                    "created_at": datetime.now(timezone.utc),
+                }
+            )
+        if rows:
+            # executemany lets SQLAlchemy split large batches under driver parameter limits.
+            self.session.connection().execute(self._insert_ignore(Article.__table__), rows)
+
+    def _update_article(self, article_id: str, **values) -> None:
+        self.session.query(Article).filter(Article.id == article_id).update(
+            values, synchronize_session=False
+        )
+
+    def _insert_ignore(self, model_class):
+        """Dialect-specific INSERT that supports ON CONFLICT DO NOTHING ... RETURNING."""
+        if self.session.get_bind().dialect.name == "sqlite":
+            return sqlite.insert(model_class).on_conflict_do_nothing()
+        return postgresql.insert(model_class).on_conflict_do_nothing()
+
+    def _upsert(self, model_class, index_elements: List[str], update_columns: List[str]):
+        """Dialect-specific INSERT ... ON CONFLICT (index_elements) DO UPDATE of update_columns."""
+        dialect = sqlite if self.session.get_bind().dialect.name == "sqlite" else postgresql
+        stmt = dialect.insert(model_class)
+        return stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: stmt.excluded[column] for column in update_columns},
+        )
+
     def create_youtube_video(
         self,
         video_id: str,
@@ -55,6 +132,10 @@ class Repository:
             image_url=thumb,
         )
         self.session.add(video)
+        self._add_articles(YouTubeVideo, [{
+            "video_id": video_id, "title": title, "url": url, "image_url": thumb,
+            "published_at": published_at, "transcript": transcript,
+        }])
         self.session.commit()
         return video
 
@@ -79,6 +160,9 @@ class Repository:
             category=category,
         )
         self.session.add(article)
+        self._add_articles(OpenAIArticle, [
+            {"guid": guid, "title": title, "url": url, "published_at": published_at}
+        ])
         self.session.commit()
         return article
 
@@ -103,6 +187,9 @@ class Repository:
             category=category,
         )
         self.session.add(article)
+        self._add_articles(AnthropicArticle, [
+            {"guid": guid, "title": title, "url": url, "published_at": published_at}
+        ])
         self.session.commit()
         return article
 
@@ -179,135 +266,245 @@ class Repository:
             formatted_articles, GeneralRSSArticle, "guid", "guid"
         )
 
+    def _iter_keyset(self, query, key_column, limit: Optional[int] = None, chunk_size: int = 200):
+        """
+        Page through `query` in `key_column` order, `chunk_size` rows at a time.
+
+        Keyset paging (key > last seen) keeps each page an index range scan and
+        stays correct while the caller commits changes that drop rows out of
+        the filter. ORM rows are detached so commits don't expire and reload them.
+        """
+        last = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            page = query if last is None else query.filter(key_column > last)
+            rows = page.order_by(key_column).limit(size).all()
+            if not rows:
+                return
+            last = getattr(rows[-1], key_column.key)
+            for row in rows:
+                if hasattr(row, "_sa_instance_state"):
+                    self.session.expunge(row)
+            yield from rows
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
+
+    def _anthropic_without_markdown_query(self):
+        return self.session.query(AnthropicArticle).filter(AnthropicArticle.markdown.is_(None))
+
     def get_anthropic_articles_without_markdown(
         self, limit: Optional[int] = None
     ) -> List[AnthropicArticle]:
-        query = self.session.query(AnthropicArticle).filter(
-            AnthropicArticle.markdown.is_(None)
+        return list(self.iter_anthropic_articles_without_markdown(limit=limit))
+
+    def iter_anthropic_articles_without_markdown(
+        self, limit: Optional[int] = None, chunk_size: int = 200
+    ) -> Iterator[AnthropicArticle]:
+        return self._iter_keyset(
+            self._anthropic_without_markdown_query(), AnthropicArticle.guid, limit, chunk_size
         )
-        if limit:
-            query = query.limit(limit)
-        return query.all()
+
+    def count_anthropic_articles_without_markdown(self) -> int:
+        return self._anthropic_without_markdown_query().count()
 
     def update_anthropic_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(AnthropicArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._update_article(f"anthropic:{guid}", has_content=bool(markdown))
             self.session.commit()
             return True
         return False
 
+    def update_anthropic_articles_markdown(self, markdown_by_guid: Dict[str, str]) -> Set[str]:
+        """Bulk form of update_anthropic_article_markdown: one commit. Returns the guids that exist."""
+        found = self._bulk_update_source(
+            AnthropicArticle, "guid", "markdown", "anthropic", markdown_by_guid,
+            lambda markdown: bool(markdown),
+        )
+        self.session.commit()
+        return found
+
+    def _bulk_update_source(
+        self, model_class, key: str, column: str, article_type: str, values: Dict[str, Any], has_content
+    ) -> Set[str]:
+        """executemany UPDATE of one source column plus the mirrored articles.has_content. Does not commit."""
+        key_col = getattr(model_class, key)
+        found = {k for (k,) in self.session.query(key_col).filter(key_col.in_(list(values)))}
+        if not found:
+            return found
+        table = model_class.__table__
+        conn = self.session.connection()
+        conn.execute(
+            update(table).where(table.c[key] == bindparam("b_key")).values({column: bindparam("b_value")}),
+            [{"b_key": k, "b_value": values[k]} for k in found],
+        )
+        articles = Article.__table__
+        conn.execute(
+            update(articles).where(articles.c.id == bindparam("b_id")).values(has_content=bindparam("b_has")),
+            [{"b_id": f"{article_type}:{k}", "b_has": has_content(values[k])} for k in found],
+        )
+        return found
+
+    def _youtube_without_transcript_query(self):
+        return self.session.query(YouTubeVideo).filter(YouTubeVideo.transcript.is_(None))
+
     def get_youtube_videos_without_transcript(
         self, limit: Optional[int] = None
     ) -> List[YouTubeVideo]:
-        query = self.session.query(YouTubeVideo).filter(
-            YouTubeVideo.transcript.is_(None)
+        return list(self.iter_youtube_videos_without_transcript(limit=limit))
+
+    def iter_youtube_videos_without_transcript(
+        self, limit: Optional[int] = None, chunk_size: int = 200
+    ) -> Iterator[YouTubeVideo]:
+        return self._iter_keyset(
+            self._youtube_without_transcript_query(), YouTubeVideo.video_id, limit, chunk_size
         )
-        if limit:
-            query = query.limit(limit)
-        return query.all()
+
+    def count_youtube_videos_without_transcript(self) -> int:
+        return self._youtube_without_transcript_query().count()
 
     def update_youtube_video_transcript(self, video_id: str, transcript: str) -> bool:
         video = self.session.query(YouTubeVideo).filter_by(video_id=video_id).first()
         if video:
             video.transcript = transcript
+            self._update_article(
+                f"youtube:{video_id}",
+                has_content=bool(transcript) and transcript != TRANSCRIPT_UNAVAILABLE,
+            )
             self.session.commit()
             return True
         return False
 
+    def update_youtube_video_transcripts(self, transcript_by_video_id: Dict[str, str]) -> Set[str]:
+        """Bulk form of update_youtube_video_transcript: one commit. Returns the video ids that exist."""
+        found = self._bulk_update_source(
+            YouTubeVideo, "video_id", "transcript", "youtube", transcript_by_video_id,
+            lambda transcript: bool(transcript) and transcript != TRANSCRIPT_UNAVAILABLE,
+        )
+        self.session.commit()
+        return found
+
+    def _articles_without_digest_query(
+        self, article_type: Optional[str] = None, since: Optional[datetime] = None
+    ):
+        query = self.session.query(Article).filter(
+            Article.digested.is_(False), Article.has_content.is_(True)
+        )
+        if article_type is not None:
+            query = query.filter(Article.article_type == article_type)
+        if since is not None:
+            query = query.filter(Article.published_at >= since)
+        return query
+
     def get_articles_without_digest(
         self, limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        articles = []
-        seen_ids = set()
+        return list(self.iter_articles_without_digest(limit=limit))
 
-        digests = self.session.query(Digest).all()
-        for d in digests:
-            seen_ids.add(f"{d.article_type}:{d.article_id}")
+    def iter_articles_without_digest(
+        self,
+        limit: Optional[int] = None,
+        chunk_size: int = 100,
+        article_type: Optional[str] = None,
+        since: Optional[datetime] = None,
+        newest_first: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Pending articles as digest-ready dicts, hydrated one page at a time.
+        `newest_first` pages by (published_at, id) descending instead of by id.
+        """
+        query = self._articles_without_digest_query(article_type, since)
+        if newest_first:
+            rows = self._iter_articles_newest_first(query, limit, chunk_size)
+        else:
+            rows = self._iter_keyset(query, Article.id, limit, chunk_size)
+        page: List[Article] = []
+        for a in rows:
+            page.append(a)
+            if len(page) >= chunk_size:
+                yield from self._hydrate_articles(page)
+                page = []
+        if page:
+            yield from self._hydrate_articles(page)
 
-        youtube_videos = (
-            self.session.query(YouTubeVideo)
-            .filter(
-                YouTubeVideo.transcript.isnot(None),
-                YouTubeVideo.transcript != "__UNAVAILABLE__",
-            )
-            .all()
-        )
-        for video in youtube_videos:
-            key = f"youtube:{video.video_id}"
-            if key not in seen_ids:
-                thumb = getattr(video, "image_url", None) or (
-                    f"https://i.ytimg.com/vi/{video.video_id}/hqdefault.jpg"
-                )
-                articles.append(
-                    {
-                        "type": "youtube",
-                        "id": video.video_id,
-                        "title": video.title,
-                        "url": video.url,
-                        "content": video.transcript or video.description or "",
-                        "published_at": video.published_at,
-                        "image_url": thumb,
-                    }
-                )
+    def _iter_articles_newest_first(self, query, limit: Optional[int], chunk_size: int):
+        last = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            page = query
+            if last is not None:
+                page = page.filter(or_(
+                    Article.published_at < last[0],
+                    and_(Article.published_at == last[0], Article.id < last[1]),
+                ))
+            rows = page.order_by(Article.published_at.desc(), Article.id.desc()).limit(size).all()
+            if not rows:
+                return
+            last = (rows[-1].published_at, rows[-1].id)
+            for row in rows:
+                self.session.expunge(row)
+            yield from rows
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
 
-        openai_articles = self.session.query(OpenAIArticle).all()
-        for article in openai_articles:
-            key = f"openai:{article.guid}"
-            if key not in seen_ids:
-                articles.append(
-                    {
-                        "type": "openai",
-                        "id": article.guid,
-                        "title": article.title,
-                        "url": article.url,
-                        "content": article.description or "",
-                        "published_at": article.published_at,
-                        "image_url": getattr(article, "image_url", None),
-                    }
-                )
+    def count_articles_without_digest(self, since: Optional[datetime] = None) -> int:
+        return self._articles_without_digest_query(since=since).count()
 
-        anthropic_articles = (
-            self.session.query(AnthropicArticle)
-            .filter(AnthropicArticle.markdown.isnot(None))
-            .all()
-        )
-        for article in anthropic_articles:
-            key = f"anthropic:{article.guid}"
-            if key not in seen_ids:
-                articles.append(
-                    {
-                        "type": "anthropic",
-                        "id": article.guid,
-                        "title": article.title,
-                        "url": article.url,
-                        "content": article.markdown or article.description or "",
-                        "published_at": article.published_at,
-                        "image_url": getattr(article, "image_url", None),
-                    }
-                )
+    def get_pending_article_types(self, since: Optional[datetime] = None) -> List[str]:
+        query = self._articles_without_digest_query(since=since)
+        return [t for (t,) in query.with_entities(Article.article_type).distinct()]
 
-        # General RSS Articles
-        general_articles = self.session.query(GeneralRSSArticle).all()
-        for article in general_articles:
-            key = f"{article.source}:{article.guid}"
-            if key not in seen_ids:
-                articles.append(
-                    {
-                        "type": article.source,
-                        "id": article.guid,
-                        "title": article.title,
-                        "url": article.url,
-                        "content": article.description or "",
-                        "published_at": article.published_at,
-                        "image_url": getattr(article, "image_url", None),
-                    }
-                )
+    def _hydrate_articles(self, pending: List[Article]) -> List[Dict[str, Any]]:
+        # Hydrate content from the source tables: one primary-key lookup per type.
+        ids_by_type: Dict[str, List[str]] = {}
+        for a in pending:
+            ids_by_type.setdefault(a.article_type, []).append(a.source_id)
+        content = {}
+        for article_type, source_ids in ids_by_type.items():
+            content.update(self._get_article_contents(article_type, source_ids))
 
-        if limit:
-            articles = articles[:limit]
+        return [
+            {
+                "type": a.article_type,
+                "id": a.source_id,
+                "title": a.title,
+                "url": a.url,
+                "content": content.get(a.id, ""),
+                "published_at": a.published_at,
+                "image_url": a.image_url,
+            }
+            for a in pending
+        ]
 
-        return articles
+    def _get_article_contents(self, article_type: str, source_ids: List[str]) -> Dict[str, str]:
+        if article_type == "youtube":
+            rows = self.session.query(
+                YouTubeVideo.video_id, YouTubeVideo.transcript, YouTubeVideo.description
+            ).filter(YouTubeVideo.video_id.in_(source_ids))
+        elif article_type == "openai":
+            rows = self.session.query(OpenAIArticle.guid, OpenAIArticle.description).filter(
+                OpenAIArticle.guid.in_(source_ids)
+            )
+        elif article_type == "anthropic":
+            rows = self.session.query(
+                AnthropicArticle.guid, AnthropicArticle.markdown, AnthropicArticle.description
+            ).filter(AnthropicArticle.guid.in_(source_ids))
+        else:
+            rows = self.session.query(GeneralRSSArticle.guid, GeneralRSSArticle.description).filter(
+                GeneralRSSArticle.source == article_type,
+                GeneralRSSArticle.guid.in_(source_ids),
+            )
+        return {
+            f"{article_type}:{row[0]}": next((v for v in row[1:] if v), "")
+            for row in rows
+        }
 
     def create_digest(
         self,
@@ -318,7 +515,9 @@ class Repository:
         summary: str,
         published_at: Optional[datetime] = None,
         image_url: Optional[str] = None,
+        content: Optional[str] = None,
     ) -> Optional[Digest]:
+        """`content` is the source article text; it is only used for the search index."""
         digest_id = f"{article_type}:{article_id}"
         existing = self.session.query(Digest).filter_by(id=digest_id).first()
         if existing:
@@ -333,6 +532,7 @@ class Repository:
 
         digest = Digest(
             id=digest_id,
+            digest_key=make_digest_key(digest_id),
             article_type=article_type,
             article_id=article_id,
             url=url,
@@ -342,9 +542,73 @@ class Repository:
             image_url=image_url,
         )
         self.session.add(digest)
+        self._update_article(digest_id, digested=True)
+        search.index_document(
+            self.session,
+            doc_id=digest_id,
+            article_type=article_type,
+            title=title,
+            summary=summary,
+            content=content,
+            created_at=created_at,
+        )
         self.session.commit()
         return digest
 
+    def create_digests(self, digests: List[Dict[str, Any]]) -> List[str]:
+        """
+        Bulk form of create_digest: each dict takes create_digest's keyword arguments.
+        Already-digested articles are skipped as before. One INSERT, one articles
+        UPDATE, one search-index write and one commit for the whole batch.
+        Returns the ids of the digests created.
+        """
+        rows, docs = [], []
+        for d in digests:
+            digest_id = f"{d['article_type']}:{d['article_id']}"
+            published_at = d.get("published_at")
+            if published_at:
+                if published_at.tzinfo is None:
+                    published_at = published_at.replace(tzinfo=timezone.utc)
+                created_at = published_at
+            else:
+                created_at = datetime.now(timezone.utc)
+            rows.append({
+                "id": digest_id,
+                "digest_key": make_digest_key(digest_id),
+                "article_type": d["article_type"],
+                "article_id": d["article_id"],
+                "url": d["url"],
+                "title": d["title"],
+                "summary": d["summary"],
+                "created_at": created_at,
+                "image_url": d.get("image_url"),
+            })
+            docs.append({
+                "doc_id": digest_id,
+                "article_type": d["article_type"],
+                "title": d["title"],
+                "summary": d["summary"],
+                "content": d.get("content"),
+                "created_at": created_at,
+            })
+        if not rows:
+            return []
+
+        existing = {
+            i for (i,) in self.session.query(Digest.id).filter(Digest.id.in_([r["id"] for r in rows]))
+        }
+        new_ids = [r["id"] for r in rows if r["id"] not in existing]
+        if new_ids:
+            self.session.connection().execute(
+                self._insert_ignore(Digest.__table__), [r for r in rows if r["id"] not in existing]
+            )
+            self.session.query(Article).filter(Article.id.in_(new_ids)).update(
+                {Article.digested: True}, synchronize_session=False
+            )
+            search.index_documents(self.session, [doc for doc in docs if doc["doc_id"] not in existing])
+        self.session.commit()
+        return new_ids
+
     def get_recent_digests(
         self, hours: int = 24, exclude_sent: bool = True
     ) -> List[Dict[str, Any]]:
@@ -375,7 +639,8 @@ class Repository:
         if not digest_ids:
             return []
             
-        digests = self.session.query(Digest).filter(Digest.id.in_(digest_ids)).all()
+        keys = [make_digest_key(d) for d in digest_ids]
+        digests = self.session.query(Digest).filter(Digest.digest_key.in_(keys)).all()
         
         return [
             {
@@ -392,11 +657,16 @@ class Repository:
             for d in digests
         ]
 
+    def search_digests(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        return search.search_documents(self.session, query, limit=limit, offset=offset)
+
     def mark_digests_as_sent(self, digest_ids: List[str]) -> int:
         sent_time = datetime.now(timezone.utc)
         updated = (
             self.session.query(Digest)
-            .filter(Digest.id.in_(digest_ids))
+            .filter(Digest.digest_key.in_([make_digest_key(d) for d in digest_ids]))
             .update({Digest.sent_at: sent_time}, synchronize_session=False)
         )
         self.session.commit()
@@ -427,14 +697,81 @@ class Repository:
     def get_user_by_email(self, email: str) -> Optional[User]:
         return self.session.query(User).filter_by(email=email).first()
 
-    def get_active_users(self) -> List[User]:
+    def get_active_users(self, trial_cutoff: Optional[datetime] = None) -> List[User]:
         # String 'true' because sqlite/simple mapping. In production use real boolean.
-        return self.session.query(User).filter(User.is_active == "true").all()
+        query = self.session.query(User).filter(User.is_active == "true")
+        if trial_cutoff is not None:
+            # Drop non-admins whose trial ran out (created at or before the cutoff)
+            query = query.filter(or_(
+                User.role == "admin",
+                User.created_at.is_(None),
+                User.created_at > trial_cutoff,
+            ))
+        return query.all()
+
+    def _trial_users_query(self, email: Optional[str] = None):
+        query = self.session.query(User).filter(
+            User.is_active == "true",
+            or_(User.role.is_(None), User.role != "admin"),
+        )
+        if email:
+            query = query.filter(func.lower(func.trim(User.email)) == email)
+        return query
+
+    @staticmethod
+    def _flag_unset(column):
+        return func.lower(func.coalesce(column, "false")) != "true"
+
+    def get_trial_users_created_between(
+        self,
+        start: Optional[datetime],
+        end: datetime,
+        unsent_flag: str,
+        email: Optional[str] = None,
+    ) -> List[User]:
+        """
+        Active non-admin users created in (start, end] whose `unsent_flag`
+        column is not yet 'true'. A None start means open-ended.
+        """
+        query = self._trial_users_query(email).filter(
+            User.created_at <= end,
+            self._flag_unset(getattr(User, unsent_flag)),
+        )
+        if start is not None:
+            query = query.filter(User.created_at > start)
+        return query.all()
+
+    def set_user_flag(self, user_ids: List[str], flag: str) -> int:
+        """Set a string-boolean flag column to 'true' for many users in one UPDATE."""
+        if not user_ids:
+            return 0
+        updated = (
+            self.session.query(User)
+            .filter(User.id.in_(user_ids))
+            .update({getattr(User, flag): "true"}, synchronize_session=False)
+        )
+        self.session.commit()
+        return updated
+
+    def expire_trial_users(self, cutoff: datetime, email: Optional[str] = None) -> int:
+        """Mark every active non-admin created at or before `cutoff` as expired."""
+        updated = (
+            self._trial_users_query(email)
+            .filter(
+                User.created_at <= cutoff,
+                or_(User.subscription_status.is_(None), User.subscription_status != "expired"),
+            )
+            .update({User.subscription_status: "expired"}, synchronize_session=False)
+        )
+        self.session.commit()
+        return updated
 
     def update_user_preferences(self, user_id: str, new_preferences: str) -> bool:
         user = self.session.query(User).filter_by(id=user_id).first()
         if user:
             user.preferences = new_preferences
+            # Stored curator scores were computed for the old interests.
+            self.session.query(DigestScore).filter_by(user_id=user_id).delete(synchronize_session=False)
             self.session.commit()
             return True
     def update_user_status(self, user_id: str, status: str) -> bool:
@@ -466,7 +803,7 @@ class Repository:
         # Check if already recommended
         existing = (
             self.session.query(Recommendation)
-            .filter_by(user_id=user_id, digest_id=digest_id)
+            .filter_by(user_id=user_id, digest_key=make_digest_key(digest_id))
             .first()
         )
         if existing:
@@ -482,15 +819,140 @@ class Repository:
             id=str(uuid.uuid4()),
             user_id=user_id,
             digest_id=digest_id,
+            digest_key=make_digest_key(digest_id),
             relevance_score=str(relevance_score),
             rank=str(rank),
             reasoning=reasoning,
             created_at=datetime.now(timezone.utc),
+            digest_created_at=digest.created_at,
+            rank_position=int(rank),
         )
         self.session.add(rec)
         self.session.commit()
         return rec
 
+    def save_recommendations(self, user_id: str, ranked: List[Any]) -> List[str]:
+        """
+        Persist a user's ranked articles in one round trip.
+        Returns the digest IDs that were newly recommended by this call, in rank order.
+        """
+        import uuid
+        # Keep the first occurrence if the curator repeats a digest.
+        unique = {}
+        for article in ranked:
+            unique.setdefault(article.digest_id, article)
+        if not unique:
+            return []
+
+        # Validate digests exist to prevent FK violation/orphans
+        keys = {make_digest_key(d): d for d in unique}
+        created = {
+            keys[row.digest_key]: row.created_at
+            for row in self.session.query(Digest.digest_key, Digest.created_at).filter(
+                Digest.digest_key.in_(list(keys))
+            )
+        }
+        valid_ids = set(created)
+        for digest_id in unique.keys() - valid_ids:
+            print(f"⚠️ Warning: Attempted to recommend missing digest {digest_id}")
+
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "digest_id": digest_id,
+                "digest_key": make_digest_key(digest_id),
+                "relevance_score": str(article.relevance_score),
+                "rank": str(article.rank),
+                "reasoning": article.reasoning,
+                "created_at": now,
+                "digest_created_at": created[digest_id],
+                "rank_position": int(article.rank),
+            }
+            for digest_id, article in unique.items()
+            if digest_id in valid_ids
+        ]
+        if not rows:
+            return []
+
+        stmt = (
+            self._insert_ignore(Recommendation)
+            .values(rows)
+            .returning(Recommendation.digest_id)
+        )
+        inserted = {row.digest_id for row in self.session.execute(stmt)}
+        self.session.commit()
+        return [row["digest_id"] for row in rows if row["digest_id"] in inserted]
+
+    def get_digest_scores(
+        self, user_ids: List[str], digest_ids: List[str]
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Stored curator scores for these users within `digest_ids`, in one query.
+        Returns {user_id: {digest_id: {"relevance_score", "reasoning", "score_pass"}}}.
+        """
+        if not user_ids or not digest_ids:
+            return {}
+        canonical = {make_digest_key(d): d for d in digest_ids}
+        rows = (
+            self.session.query(
+                DigestScore.user_id,
+                DigestScore.digest_key,
+                DigestScore.relevance_score,
+                DigestScore.reasoning,
+                DigestScore.score_pass,
+            )
+            .filter(
+                DigestScore.user_id.in_(list(user_ids)),
+                DigestScore.digest_key.in_(list(canonical)),
+            )
+            .all()
+        )
+        scores: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for row in rows:
+            scores.setdefault(row.user_id, {})[canonical[row.digest_key]] = {
+                "relevance_score": row.relevance_score,
+                "reasoning": row.reasoning,
+                "score_pass": row.score_pass,
+            }
+        return scores
+
+    def save_digest_scores(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Persist curator scores (dicts with user_id, digest_id, relevance_score,
+        reasoning, score_pass) in one statement; pairs already scored are left
+        unchanged.
+        """
+        if not rows:
+            return 0
+        now = datetime.now(timezone.utc)
+        values = [
+            {
+                "user_id": row["user_id"],
+                "digest_key": make_digest_key(row["digest_id"]),
+                "digest_id": row["digest_id"],
+                "relevance_score": float(row["relevance_score"]),
+                "reasoning": row.get("reasoning"),
+                "score_pass": row.get("score_pass"),
+                "scored_at": now,
+            }
+            for row in rows
+        ]
+        self.session.connection().execute(self._insert_ignore(DigestScore), values)
+        self.session.commit()
+        return len(values)
+
+    def delete_digest_scores_before(self, cutoff: datetime) -> int:
+        """Drop scores older than `cutoff`; their digests have left the ranking window."""
+        deleted = (
+            self.session.query(DigestScore)
+            .filter(DigestScore.scored_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        self.session.commit()
+        return deleted
+
     def get_user_recommended_digest_ids(self, user_id: str) -> List[str]:
         """
         Returns a list of digest IDs that have already been recommended to the user.
@@ -502,6 +964,32 @@ class Repository:
             .all()
         ]
 
+    def get_seen_digest_ids_for_active_users(
+        self, digest_ids: List[str]
+    ) -> Dict[str, Set[str]]:
+        """
+        One query for every active user's recommendations that fall inside `digest_ids`
+        (normally the current recent_digests window). Returns {user_id: {digest_id, ...}};
+        users with nothing in the window are absent.
+        """
+        if not digest_ids:
+            return {}
+        # Map keys back to the caller's id strings so each digest id is held once in memory.
+        canonical = {make_digest_key(d): d for d in digest_ids}
+        active_ids = self.session.query(User.id).filter(User.is_active == "true")
+        rows = (
+            self.session.query(Recommendation.user_id, Recommendation.digest_key)
+            .filter(
+                Recommendation.digest_key.in_(list(canonical)),
+                Recommendation.user_id.in_(active_ids.scalar_subquery()),
+            )
+            .all()
+        )
+        seen: Dict[str, Set[str]] = {}
+        for user_id, digest_key in rows:
+            seen.setdefault(user_id, set()).add(canonical[digest_key])
+        return seen
+
     def get_user_feed(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """
         Get the 'Feed' for a user: Recommendations joined with Digest details.
@@ -509,7 +997,7 @@ class Repository:
         """
         results = (
             self.session.query(Recommendation, Digest)
-            .join(Digest, Recommendation.digest_id == Digest.id)
+            .join(Digest, Recommendation.digest_key == Digest.digest_key)
             .filter(Recommendation.user_id == user_id)
             .order_by(Digest.created_at.desc(), Recommendation.rank.asc())
             .limit(limit)
@@ -527,6 +1015,87 @@ class Repository:
 
         return feed
 
+    def get_user_feed_page(
+        self, user_id: str, limit: int = 20, cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Keyset-paginated feed ordered by (digest created_at DESC, rank ASC, id ASC).
+        Pass the returned `next_cursor` to get the following page; every page costs
+        the same regardless of depth. Raises ValueError for a malformed cursor.
+        """
+        # The keyset runs on recommendations alone (ix_recommendations_feed);
+        # digest details are fetched for the page rows only.
+        query = self.session.query(
+            Recommendation.id,
+            Recommendation.digest_key,
+            Recommendation.digest_created_at.label("created_at"),
+            Recommendation.rank_position.label("rank"),
+            Recommendation.relevance_score,
+            Recommendation.reasoning,
+        ).filter(
+            Recommendation.user_id == user_id,
+            # NULL until the digest exists; such rows had no feed entry before either.
+            Recommendation.digest_created_at.isnot(None),
+        )
+        if cursor:
+            created_at, rank, rec_id = _decode_feed_cursor(cursor)
+            query = query.filter(
+                or_(
+                    Recommendation.digest_created_at < created_at,
+                    and_(
+                        Recommendation.digest_created_at == created_at,
+                        or_(
+                            Recommendation.rank_position > rank,
+                            and_(Recommendation.rank_position == rank, Recommendation.id > rec_id),
+                        ),
+                    ),
+                )
+            )
+        rows = (
+            query.order_by(
+                Recommendation.digest_created_at.desc(),
+                Recommendation.rank_position.asc(),
+                Recommendation.id.asc(),
+            )
+            .limit(limit + 1)
+            .all()
+        )
+        digests = {
+            d.digest_key: d
+            for d in self.session.query(
+                Digest.digest_key,
+                Digest.id,
+                Digest.article_type,
+                Digest.url,
+                Digest.title,
+                Digest.summary,
+                Digest.image_url,
+            ).filter(Digest.digest_key.in_([r.digest_key for r in rows[:limit]]))
+        }
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = [
+            {
+                "digest_id": digests[r.digest_key].id,
+                "article_type": digests[r.digest_key].article_type,
+                "title": digests[r.digest_key].title,
+                "summary": digests[r.digest_key].summary,
+                "url": digests[r.digest_key].url,
+                "image_url": digests[r.digest_key].image_url,
+                "created_at": r.created_at,
+                "relevance_score": float(r.relevance_score),
+                "rank": r.rank,
+                "reasoning": r.reasoning,
+            }
+            for r in rows
+            if r.digest_key in digests
+        ]
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = _encode_feed_cursor(last.created_at, last.rank, last.id)
+        return {"items": items, "next_cursor": next_cursor}
+
     # Pipeline Monitoring Methods
     def create_pipeline_run(self) -> PipelineRun:
         import uuid
@@ -541,6 +1110,28 @@ class Repository:
         self.session.commit()
         return run
 
+    def get_latest_pipeline_run(self) -> Optional[Dict[str, Any]]:
+        run = self.session.query(PipelineRun).order_by(PipelineRun.start_time.desc()).first()
+        if not run:
+            return None
+
+        start_time = run.start_time
+        if start_time and start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=timezone.utc)
+
+        end_time = run.end_time
+        if end_time and end_time.tzinfo is None:
+            end_time = end_time.replace(tzinfo=timezone.utc)
+
+        return {
+            "id": run.id,
+            "status": run.status,
+            "start_time": start_time,
+            "end_time": end_time,
+            "log_summary": run.log_summary,
+            "users_processed": run.users_processed,
+        }
+
     def update_pipeline_run(
         self, 
         run_id: str, 
@@ -568,3 +1159,37 @@ class Repository:
             self.session.commit()
             return True
         return False
+
+    def add_pipeline_events(self, events: List[Dict[str, Any]]) -> int:
+        """Append a batch of pipeline events in a single INSERT + COMMIT."""
+        if not events:
+            return 0
+        self.session.execute(PipelineEvent.__table__.insert(), events)
+        self.session.commit()
+        return len(events)
+
+    def get_pipeline_events(
+        self, run_id: str, after_seq: int = 0, limit: int = 500
+    ) -> List[Dict[str, Any]]:
+        """
+        Events for a run with seq > after_seq, oldest first.
+        Pollers pass the last seq they saw to fetch only what is new.
+        """
+        rows = (
+            self.session.query(PipelineEvent)
+            .filter(PipelineEvent.run_id == run_id, PipelineEvent.seq > after_seq)
+            .order_by(PipelineEvent.seq.asc())
+            .limit(limit)
+            .all()
+        )
+        return [
+            {
+                "seq": e.seq,
+                "ts": e.ts,
+                "stage": e.stage,
+                "level": e.level,
+                "message": e.message,
+                "fields": json.loads(e.fields) if e.fields else None,
+            }
+            for e in rows
+        ]
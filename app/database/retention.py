@@ -0,0 +1,209 @@
+"""
+Retention job: moves rows past a configurable horizon out of the hot tables into
+`archived_rows` (one zlib-compressed JSON payload per row, bucketed by month), so
+time-window queries only ever scan recent data. Archived rows stay readable via
+`get_archived_row` / `get_archived_rows` for rare lookups.
+
+    python -m app.database.retention --days 180
+"""
+
+import argparse
+import json
+import logging
+import os
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, exists, inspect, tuple_
+
+from app.database.models import (
+    AnthropicArticle,
+    Article,
+    ArchivedRow,
+    Digest,
+    GeneralRSSArticle,
+    OpenAIArticle,
+    PipelineEvent,
+    PipelineRun,
+    Recommendation,
+    YouTubeVideo,
+)
+from app.database.repository import Repository
+from app.database import search
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 180
+BATCH_SIZE = 500
+
+# (model, time column) in archive order: recommendations go before the digests they
+# reference, and pipeline events before their runs. Source articles use published_at,
+# the same value digests take as created_at, so an article and its digest age out together.
+RETENTION_TABLES = [
+    (Recommendation, Recommendation.created_at),
+    (Digest, Digest.created_at),
+    (YouTubeVideo, YouTubeVideo.published_at),
+    (OpenAIArticle, OpenAIArticle.published_at),
+    (AnthropicArticle, AnthropicArticle.published_at),
+    (GeneralRSSArticle, GeneralRSSArticle.published_at),
+    (Article, Article.published_at),
+    (PipelineEvent, PipelineEvent.ts),
+    (PipelineRun, PipelineRun.start_time),
+]
+
+MODELS_BY_TABLE = {model.__tablename__: model for model, _ in RETENTION_TABLES}
+
+
+def get_retention_days() -> int:
+    return int(os.getenv("RETENTION_DAYS", DEFAULT_RETENTION_DAYS))
+
+
+def _row_key(model, row) -> str:
+    return ":".join(str(getattr(row, c.name)) for c in model.__table__.primary_key.columns)
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+
+def _pack(model, row) -> bytes:
+    data = {c.name: getattr(row, c.name) for c in model.__table__.columns}
+    return zlib.compress(json.dumps(data, default=_json_default).encode("utf-8"))
+
+
+def _unpack(model, payload: bytes) -> Dict[str, Any]:
+    data = json.loads(zlib.decompress(payload).decode("utf-8"))
+    for column in model.__table__.columns:
+        if isinstance(column.type, DateTime) and data.get(column.name):
+            data[column.name] = datetime.fromisoformat(data[column.name])
+    return data
+
+
+def _archive_filters(model, time_col, cutoff: datetime) -> list:
+    filters = [time_col < cutoff]
+    if model is Digest:
+        # Keep digests that hot recommendations still point at (feed joins need them).
+        filters.append(~exists().where(Recommendation.digest_key == Digest.digest_key))
+    return filters
+
+
+def archive_table(
+    repo: Repository, model, time_col, cutoff: datetime, batch_size: int = BATCH_SIZE
+) -> int:
+    """Move every row of `model` older than `cutoff` into archived_rows, one batch per commit."""
+    table = model.__tablename__
+    pk_cols = list(model.__table__.primary_key.columns)
+    filters = _archive_filters(model, time_col, cutoff)
+    # Archived digests also leave the full-text index, when it exists.
+    drop_search_docs = model is Digest and inspect(repo.session.get_bind()).has_table(
+        "search_documents"
+    )
+    moved = 0
+
+    while True:
+        rows = repo.session.query(model).filter(*filters).limit(batch_size).all()
+        if not rows:
+            break
+
+        archived = []
+        for row in rows:
+            ts = getattr(row, time_col.key)
+            archived.append(
+                {
+                    "table_name": table,
+                    "row_key": _row_key(model, row),
+                    "row_ts": ts,
+                    "bucket": ts.strftime("%Y-%m") if ts else "unknown",
+                    "payload": _pack(model, row),
+                    "archived_at": datetime.now(timezone.utc),
+                }
+            )
+        try:
+            # A row archived again (e.g. re-scraped, then aged out a second
+            # time) replaces the older payload, since the hot row is deleted next.
+            repo.session.execute(
+                repo._upsert(
+                    ArchivedRow,
+                    ["table_name", "row_key"],
+                    ["row_ts", "bucket", "payload", "archived_at"],
+                ).values(archived)
+            )
+            keys = [tuple(getattr(row, c.key) for c in pk_cols) for row in rows]
+            if len(pk_cols) == 1:
+                key_filter = pk_cols[0].in_([k[0] for k in keys])
+            else:
+                key_filter = tuple_(*pk_cols).in_(keys)
+            repo.session.query(model).filter(key_filter).delete(synchronize_session=False)
+            if drop_search_docs:
+                search.delete_documents(repo.session, [k[0] for k in keys])
+            repo.session.commit()
+        except Exception:
+            repo.session.rollback()
+            raise
+        repo.session.expunge_all()
+
+        moved += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if moved:
+        logger.info(f"Archived {moved} rows from {table}")
+    return moved
+
+
+def run_retention(days: Optional[int] = None, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """Archive everything older than `days` (default RETENTION_DAYS env, 180) from the hot tables."""
+    days = days if days is not None else get_retention_days()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    repo = Repository()
+    results = {}
+    try:
+        for model, time_col in RETENTION_TABLES:
+            results[model.__tablename__] = archive_table(
+                repo, model, time_col, cutoff, batch_size=batch_size
+            )
+    finally:
+        repo.session.close()
+    return results
+
+
+def get_archived_row(table_name: str, row_key: str, repo: Optional[Repository] = None) -> Optional[Dict[str, Any]]:
+    """Look up one archived row by its hot-table primary key (e.g. a digest id)."""
+    rows = get_archived_rows(table_name, [row_key], repo=repo)
+    return rows[0] if rows else None
+
+
+def get_archived_rows(
+    table_name: str, row_keys: List[str], repo: Optional[Repository] = None
+) -> List[Dict[str, Any]]:
+    model = MODELS_BY_TABLE.get(table_name)
+    if model is None:
+        raise ValueError(f"Table {table_name!r} is not archived")
+    if not row_keys:
+        return []
+    repo = repo or Repository()
+    rows = (
+        repo.session.query(ArchivedRow)
+        .filter(ArchivedRow.table_name == table_name, ArchivedRow.row_key.in_(row_keys))
+        .all()
+    )
+    return [_unpack(model, r.payload) for r in rows]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    parser = argparse.ArgumentParser(description="Archive rows past the retention horizon.")
+    parser.add_argument("--days", type=int, default=None, help="Retention horizon in days")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    result = run_retention(days=args.days, batch_size=args.batch_size)
+    for table, count in result.items():
+        print(f"{table}: {count} archived")
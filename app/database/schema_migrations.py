@@ -16,6 +16,16 @@ def _add_column_if_missing(table: str, column: str, sql_type: str) -> None:
         conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}"))
 
 
+def _create_index_if_missing(table: str, name: str, columns: str) -> None:
+    insp = inspect(engine)
+    if table not in insp.get_table_names():
+        return
+    if name in {ix["name"] for ix in insp.get_indexes(table)}:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
 def ensure_image_url_columns() -> None:
     """Add image_url to article and digest tables when missing."""
     if engine.dialect.name == "sqlite":
@@ -30,3 +40,218 @@ def ensure_image_url_columns() -> None:
         "general_rss_articles",
     ):
         _add_column_if_missing(table, "image_url", col_type)
+
+
+def _index_and_constraint_names(table: str) -> set:
+    insp = inspect(engine)
+    names = {ix["name"] for ix in insp.get_indexes(table)}
+    names |= {uc["name"] for uc in insp.get_unique_constraints(table)}
+    return names
+
+
+def ensure_recommendation_unique_index() -> None:
+    """Enforce one recommendation per (user, digest) so bulk inserts can skip conflicts."""
+    insp = inspect(engine)
+    if "recommendations" not in insp.get_table_names():
+        return
+    existing = _index_and_constraint_names("recommendations")
+    # Superseded by the (user_id, digest_key) index from ensure_digest_surrogate_keys.
+    if existing & {"uq_recommendations_user_digest", "uq_recommendations_user_digest_key"}:
+        return
+    with engine.begin() as conn:
+        # Drop duplicates left over from the old check-then-insert path first.
+        conn.execute(
+            text(
+                "DELETE FROM recommendations WHERE id NOT IN "
+                "(SELECT MIN(id) FROM recommendations GROUP BY user_id, digest_id)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_recommendations_user_digest "
+                "ON recommendations (user_id, digest_id)"
+            )
+        )
+
+
+def ensure_digest_created_at_index() -> None:
+    """Index digests.created_at for the recent-window and feed keyset queries."""
+    _create_index_if_missing("digests", "ix_digests_created_at", "created_at")
+
+
+def ensure_search_documents() -> None:
+    """Full-text index table (tsvector + GIN on Postgres, FTS5 on SQLite)."""
+    from app.database.search import ensure_search_index
+
+    ensure_search_index(engine)
+
+
+def ensure_articles_backfilled() -> None:
+    """Populate the unified `articles` read model from the source tables once."""
+    from sqlalchemy import and_, exists, func, insert, literal, select, true
+
+    from app.database.models import (
+        AnthropicArticle,
+        Article,
+        Digest,
+        GeneralRSSArticle,
+        OpenAIArticle,
+        YouTubeVideo,
+    )
+
+    insp = inspect(engine)
+    if "articles" not in insp.get_table_names():
+        return
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(Article)).scalar():
+            return
+
+        def _source_select(model, article_type, source_id, has_content):
+            article_id = article_type + literal(":") + source_id
+            return select(
+                article_id,
+                article_type,
+                source_id,
+                model.title,
+                model.url,
+                model.image_url,
+                model.published_at,
+                has_content,
+                exists().where(Digest.id == article_id),
+                func.coalesce(model.created_at, func.current_timestamp()),
+            )
+
+        sources = [
+            _source_select(
+                YouTubeVideo, literal("youtube"), YouTubeVideo.video_id,
+                and_(YouTubeVideo.transcript.isnot(None), YouTubeVideo.transcript != "__UNAVAILABLE__"),
+            ),
+            _source_select(OpenAIArticle, literal("openai"), OpenAIArticle.guid, true()),
+            _source_select(
+                AnthropicArticle, literal("anthropic"), AnthropicArticle.guid,
+                AnthropicArticle.markdown.isnot(None),
+            ),
+            _source_select(GeneralRSSArticle, GeneralRSSArticle.source, GeneralRSSArticle.guid, true()),
+        ]
+        columns = [
+            "id", "article_type", "source_id", "title", "url", "image_url",
+            "published_at", "has_content", "digested", "created_at",
+        ]
+        for source in sources:
+            conn.execute(insert(Article).from_select(columns, source))
+
+
+def ensure_digest_surrogate_keys(batch_size: int = 1000) -> None:
+    """
+    Add BIGINT digest_key columns to digests and recommendations, backfill them from
+    the natural string ids and move the recommendation uniqueness onto the integer key.
+    """
+    from app.database.models import make_digest_key
+
+    _add_column_if_missing("digests", "digest_key", "BIGINT")
+    _add_column_if_missing("recommendations", "digest_key", "BIGINT")
+    insp = inspect(engine)
+    if not {"digests", "recommendations"} <= set(insp.get_table_names()):
+        return
+
+    for table, id_column in (("digests", "id"), ("recommendations", "digest_id")):
+        while True:
+            with engine.begin() as conn:
+                ids = conn.execute(
+                    text(
+                        f"SELECT DISTINCT {id_column} FROM {table} "
+                        f"WHERE digest_key IS NULL LIMIT {batch_size}"
+                    )
+                ).scalars().all()
+                if not ids:
+                    break
+                conn.execute(
+                    text(f"UPDATE {table} SET digest_key = :key WHERE {id_column} = :id"),
+                    [{"key": make_digest_key(i), "id": i} for i in ids],
+                )
+
+    existing = _index_and_constraint_names("digests")
+    if "ix_digests_digest_key" not in existing and not any(
+        uc["column_names"] == ["digest_key"] for uc in insp.get_unique_constraints("digests")
+    ):
+        with engine.begin() as conn:
+            conn.execute(
+                text("CREATE UNIQUE INDEX IF NOT EXISTS ix_digests_digest_key ON digests (digest_key)")
+            )
+
+    existing = _index_and_constraint_names("recommendations")
+    if "uq_recommendations_user_digest_key" not in existing:
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS uq_recommendations_user_digest_key "
+                    "ON recommendations (user_id, digest_key)"
+                )
+            )
+    if "uq_recommendations_user_digest" in existing:
+        # The string-keyed index is now redundant; drop it to save space.
+        is_constraint = any(
+            uc["name"] == "uq_recommendations_user_digest"
+            for uc in insp.get_unique_constraints("recommendations")
+        )
+        with engine.begin() as conn:
+            if not is_constraint:
+                conn.execute(text("DROP INDEX IF EXISTS uq_recommendations_user_digest"))
+            elif engine.dialect.name != "sqlite":
+                conn.execute(
+                    text("ALTER TABLE recommendations DROP CONSTRAINT uq_recommendations_user_digest")
+                )
+
+
+def ensure_recommendation_feed_columns() -> None:
+    """
+    Copy digests.created_at and the integer rank onto recommendations and index
+    (user_id, digest_created_at DESC, rank_position, id) for the feed keyset.
+    The backfill runs once: the index is created after it, and its presence
+    means every existing row has been filled (save_recommendations fills new
+    ones), so later startups skip the full-table UPDATEs.
+    """
+    _add_column_if_missing("recommendations", "digest_created_at", "TIMESTAMP")
+    _add_column_if_missing("recommendations", "rank_position", "INTEGER")
+    insp = inspect(engine)
+    if not {"digests", "recommendations"} <= set(insp.get_table_names()):
+        return
+    if "ix_recommendations_feed" in {ix["name"] for ix in insp.get_indexes("recommendations")}:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "UPDATE recommendations SET digest_created_at = "
+                "(SELECT d.created_at FROM digests d WHERE d.digest_key = recommendations.digest_key) "
+                "WHERE digest_created_at IS NULL"
+            )
+        )
+        conn.execute(
+            text(
+                "UPDATE recommendations SET rank_position = CAST(rank AS INTEGER) "
+                "WHERE rank_position IS NULL"
+            )
+        )
+    _create_index_if_missing(
+        "recommendations",
+        "ix_recommendations_feed",
+        "user_id, digest_created_at DESC, rank_position, id",
+    )
+
+
+def ensure_digest_score_pass_column() -> None:
+    """Record which curator pass (single, refine or chunk) produced each stored score."""
+    col_type = "TEXT" if engine.dialect.name == "sqlite" else "VARCHAR"
+    _add_column_if_missing("digest_scores", "score_pass", col_type)
+
+
+def apply_schema_migrations() -> None:
+    """Run every additive migration above; each one is a no-op once applied."""
+    ensure_image_url_columns()
+    ensure_recommendation_unique_index()
+    ensure_digest_surrogate_keys()
+    ensure_digest_created_at_index()
+    ensure_recommendation_feed_columns()
+    ensure_digest_score_pass_column()
+    ensure_search_documents()
+    ensure_articles_backfilled()
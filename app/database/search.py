@@ -0,0 +1,347 @@
+"""
+Full-text search over digests and the article text they were generated from.
+
+`search_documents` holds one row per digest (title + digest summary + source
+article text). On Postgres it carries a weighted tsvector generated column with
+a GIN index; on SQLite it is an FTS5 virtual table whose rowid is the digest's
+`digest_key`, so rows are replaced and deleted by rowid instead of scanning
+the UNINDEXED doc_id column. Rows are written by
+`Repository.create_digest(s)`, and `rebuild_search_index` backfills existing digests.
+
+    python -m app.database.search --rebuild
+"""
+
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Long transcripts add little recall beyond their first pages but bloat the index.
+MAX_BODY_CHARS = 20000
+# Digests per index write when rebuilding or re-keying the index.
+INDEX_BATCH_SIZE = 500
+
+
+def _dialect(session: Session) -> str:
+    return session.get_bind().dialect.name
+
+
+def ensure_search_index(engine) -> None:
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(
+                text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents USING fts5("
+                    "doc_id UNINDEXED, article_type UNINDEXED, title, body, "
+                    "created_at UNINDEXED, tokenize='porter unicode61')"
+                )
+            )
+            _rekey_fts_rows(conn)
+            return
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS search_documents ("
+                "doc_id VARCHAR PRIMARY KEY, "
+                "article_type VARCHAR NOT NULL, "
+                "title TEXT NOT NULL, "
+                "body TEXT, "
+                "created_at TIMESTAMP, "
+                "tsv tsvector GENERATED ALWAYS AS ("
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_search_documents_tsv "
+                "ON search_documents USING GIN (tsv)"
+            )
+        )
+
+
+def _rekey_fts_rows(conn) -> None:
+    """
+    One-time migration for FTS5 indexes written before rows were keyed by
+    digest_key: if a sampled row has an arbitrary rowid, re-insert every row
+    under make_digest_key(doc_id). A no-op once applied.
+    """
+    from app.database.models import make_digest_key
+
+    sample = conn.execute(text("SELECT rowid, doc_id FROM search_documents LIMIT 1")).first()
+    if sample is None or sample.rowid == make_digest_key(sample.doc_id):
+        return
+    rows = [
+        {
+            "rowid": make_digest_key(r.doc_id),
+            "doc_id": r.doc_id,
+            "article_type": r.article_type,
+            "title": r.title,
+            "body": r.body,
+            "created_at": r.created_at,
+        }
+        for r in conn.execute(
+            text("SELECT doc_id, article_type, title, body, created_at FROM search_documents")
+        )
+    ]
+    # Keep the last copy of any doc_id indexed more than once.
+    rows = list({r["rowid"]: r for r in rows}.values())
+    conn.execute(text("DELETE FROM search_documents"))
+    for i in range(0, len(rows), INDEX_BATCH_SIZE):
+        conn.execute(
+            text(
+                "INSERT INTO search_documents (rowid, doc_id, article_type, title, body, created_at) "
+                "VALUES (:rowid, :doc_id, :article_type, :title, :body, :created_at)"
+            ),
+            rows[i:i + INDEX_BATCH_SIZE],
+        )
+    logger.info(f"Re-keyed {len(rows)} search documents by digest_key")
+
+
+def index_document(
+    session: Session,
+    doc_id: str,
+    article_type: str,
+    title: str,
+    summary: str,
+    content: Optional[str] = None,
+    created_at: Optional[datetime] = None,
+) -> None:
+    """Add or replace one digest in the index. Does not commit."""
+    index_documents(session, [{
+        "doc_id": doc_id,
+        "article_type": article_type,
+        "title": title,
+        "summary": summary,
+        "content": content,
+        "created_at": created_at,
+    }])
+
+
+def index_documents(session: Session, docs: List[Dict[str, Any]]) -> None:
+    """
+    Add or replace many digests (dicts with index_document's arguments) in one
+    executemany. Does not commit. The write runs in a savepoint: if it fails
+    (e.g. a database that predates search_documents and was never migrated),
+    the caller's digests are still saved and a warning points at --rebuild.
+    """
+    if not docs:
+        return
+    try:
+        with session.begin_nested():
+            _write_documents(session, docs)
+    except Exception as e:
+        logger.warning(
+            f"Search index not updated for {len(docs)} digest(s): {e}. "
+            "Run `python -m app.database.search --rebuild` once the schema is migrated."
+        )
+
+
+def _write_documents(session: Session, docs: List[Dict[str, Any]]) -> None:
+    from app.database.models import make_digest_key
+
+    sqlite = _dialect(session) == "sqlite"
+    rows = []
+    for doc in docs:
+        body = doc.get("summary") or ""
+        if doc.get("content"):
+            body = f"{body}\n\n{doc['content'][:MAX_BODY_CHARS]}"
+        created_at = doc.get("created_at")
+        rows.append({
+            "rowid": make_digest_key(doc["doc_id"]),
+            "doc_id": doc["doc_id"],
+            "article_type": doc["article_type"],
+            "title": doc["title"],
+            "body": body,
+            "created_at": created_at.isoformat() if sqlite and created_at else created_at,
+        })
+    if sqlite:
+        # FTS5 tables have no unique keys, so replace by hand, by rowid.
+        session.execute(
+            text("DELETE FROM search_documents WHERE rowid = :rowid"),
+            [{"rowid": r["rowid"]} for r in rows],
+        )
+        session.execute(
+            text(
+                "INSERT INTO search_documents (rowid, doc_id, article_type, title, body, created_at) "
+                "VALUES (:rowid, :doc_id, :article_type, :title, :body, :created_at)"
+            ),
+            rows,
+        )
+        return
+    for row in rows:
+        del row["rowid"]
+    session.execute(
+        text(
+            "INSERT INTO search_documents (doc_id, article_type, title, body, created_at) "
+            "VALUES (:doc_id, :article_type, :title, :body, :created_at) "
+            "ON CONFLICT (doc_id) DO UPDATE SET article_type = EXCLUDED.article_type, "
+            "title = EXCLUDED.title, body = EXCLUDED.body, created_at = EXCLUDED.created_at"
+        ),
+        rows,
+    )
+
+
+def delete_documents(session: Session, doc_ids: List[str]) -> None:
+    """Drop these digests from the index. Does not commit."""
+    if not doc_ids:
+        return
+    if _dialect(session) == "sqlite":
+        from app.database.models import make_digest_key
+
+        column, values = "rowid", [make_digest_key(d) for d in doc_ids]
+    else:
+        column, values = "doc_id", list(doc_ids)
+    session.execute(
+        text(f"DELETE FROM search_documents WHERE {column} IN :ids").bindparams(
+            bindparam("ids", expanding=True)
+        ),
+        {"ids": values},
+    )
+
+
+def _fts5_query(query: str) -> str:
+    # Quote every term so user input can't be parsed as FTS5 syntax; terms are ANDed.
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{t}"' for t in terms)
+
+
+def search_documents(
+    session: Session, query: str, limit: int = 20, offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Best matches first; ties broken by recency."""
+    if not query.strip():
+        return []
+    if _dialect(session) == "sqlite":
+        match = _fts5_query(query)
+        if not match:
+            return []
+        sql = text(
+            "SELECT d.id, d.article_type, d.title, d.summary, d.url, d.image_url, "
+            "d.created_at, -bm25(search_documents, 0, 0, 4.0, 1.0, 0) AS score "
+            "FROM search_documents JOIN digests d ON d.id = search_documents.doc_id "
+            "WHERE search_documents MATCH :q "
+            "ORDER BY score DESC, d.created_at DESC LIMIT :limit OFFSET :offset"
+        )
+        params = {"q": match, "limit": limit, "offset": offset}
+    else:
+        sql = text(
+            "SELECT d.id, d.article_type, d.title, d.summary, d.url, d.image_url, "
+            "d.created_at, ts_rank_cd(s.tsv, q) AS score "
+            "FROM search_documents s, websearch_to_tsquery('english', :q) q, digests d "
+            "WHERE s.tsv @@ q AND d.id = s.doc_id "
+            "ORDER BY score DESC, d.created_at DESC LIMIT :limit OFFSET :offset"
+        )
+        params = {"q": query, "limit": limit, "offset": offset}
+    sql = sql.columns(created_at=DateTime)
+
+    return [
+        {
+            "digest_id": r.id,
+            "article_type": r.article_type,
+            "title": r.title,
+            "summary": r.summary,
+            "url": r.url,
+            "image_url": r.image_url,
+            "created_at": r.created_at,
+            "score": float(r.score),
+        }
+        for r in session.execute(sql, params)
+    ]
+
+
+def rebuild_search_index(session: Session) -> int:
+    """Backfill the index from every digest and its source article."""
+    from sqlalchemy import and_, func
+    from app.database.models import (
+        AnthropicArticle,
+        Digest,
+        GeneralRSSArticle,
+        OpenAIArticle,
+        YouTubeVideo,
+    )
+
+    # (join condition, source text) per source table; one streamed pass each.
+    unavailable = "__UNAVAILABLE__"
+    sources = [
+        (
+            YouTubeVideo,
+            and_(Digest.article_type == "youtube", Digest.article_id == YouTubeVideo.video_id),
+            func.coalesce(func.nullif(YouTubeVideo.transcript, unavailable), YouTubeVideo.description),
+        ),
+        (
+            OpenAIArticle,
+            and_(Digest.article_type == "openai", Digest.article_id == OpenAIArticle.guid),
+            OpenAIArticle.description,
+        ),
+        (
+            AnthropicArticle,
+            and_(Digest.article_type == "anthropic", Digest.article_id == AnthropicArticle.guid),
+            func.coalesce(AnthropicArticle.markdown, AnthropicArticle.description),
+        ),
+        (
+            GeneralRSSArticle,
+            and_(
+                Digest.article_type == GeneralRSSArticle.source,
+                Digest.article_id == GeneralRSSArticle.guid,
+            ),
+            GeneralRSSArticle.description,
+        ),
+    ]
+
+    def doc(digest, content=None) -> Dict[str, Any]:
+        return {
+            "doc_id": digest.id,
+            "article_type": digest.article_type,
+            "title": digest.title,
+            "summary": digest.summary,
+            "content": content,
+            "created_at": digest.created_at,
+        }
+
+    # Written INDEX_BATCH_SIZE digests per executemany.
+    batch: List[Dict[str, Any]] = []
+    indexed = set()
+
+    def add(entry: Dict[str, Any]) -> None:
+        batch.append(entry)
+        indexed.add(entry["doc_id"])
+        if len(batch) >= INDEX_BATCH_SIZE:
+            index_documents(session, batch)
+            batch.clear()
+
+    for model, on_clause, content_col in sources:
+        rows = session.query(Digest, content_col).join(model, on_clause).yield_per(INDEX_BATCH_SIZE)
+        for digest, content in rows:
+            if digest.id not in indexed:
+                add(doc(digest, content))
+
+    # Digests whose source article is gone (e.g. archived) still get title + summary.
+    for digest in session.query(Digest).yield_per(INDEX_BATCH_SIZE):
+        if digest.id not in indexed:
+            add(doc(digest))
+
+    index_documents(session, batch)
+    session.commit()
+    return len(indexed)
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.database.connection import engine, get_session
+
+    parser = argparse.ArgumentParser(description="Manage the digest full-text index.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every digest")
+    args = parser.parse_args()
+
+    ensure_search_index(engine)
+    if args.rebuild:
+        session = get_session()
+        try:
+            print(f"Indexed {rebuild_search_index(session)} digests")
+        finally:
+            session.close()
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Header
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Header, Query
 import logging
 import os
 from typing import Optional
 from app.daily_runner import run_daily_pipeline
-from app.database.connection import engine, get_session
-from app.database.models import Base, PipelineRun
+from app.database.async_repository import AsyncRepository
+from app.database.connection import engine, get_async_session
+from app.database.models import Base
+from app.database.schema_migrations import apply_schema_migrations
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +27,7 @@ app.add_middleware(
 @app.on_event("startup")
 def startup_event():
     Base.metadata.create_all(engine)
+    apply_schema_migrations()
 
 @app.get("/")
 def read_root():
@@ -50,34 +53,68 @@ async def trigger_digest(background_tasks: BackgroundTasks, x_api_key: Optional[
     return {"message": "Pipeline triggered in background"}
 
 @app.get("/api/pipeline/status")
-def get_pipeline_status():
-    session = get_session()
-    try:
-        # Get latest run
-        run = session.query(PipelineRun).order_by(PipelineRun.start_time.desc()).first()
+async def get_pipeline_status(after_seq: Optional[int] = None):
+    """
+    Latest pipeline run. Pass `after_seq` (the last event seq seen) to receive only
+    newer events; without it the full log is returned as `log_summary` too.
+    """
+    async with get_async_session() as session:
+        repo = AsyncRepository(session)
+        run = await repo.get_latest_pipeline_run()
         if not run:
             return {"status": "IDLE", "message": "No runs recorded yet."}
-        
-        from datetime import timezone
-        
-        start_time = run.start_time
-        if start_time and start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-            
-        end_time = run.end_time
-        if end_time and end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        
-        return {
-            "id": run.id,
-            "status": run.status,
-            "start_time": start_time,
-            "end_time": end_time,
-            "log_summary": run.log_summary,
-            "users_processed": run.users_processed
-        }
-    finally:
-        session.close()
+
+        events = await repo.get_pipeline_events(
+            run["id"], after_seq=after_seq or 0, limit=500 if after_seq is not None else 5000
+        )
+
+    log_summary = run.pop("log_summary")
+    response = {
+        **run,
+        "events": events,
+        "last_seq": events[-1]["seq"] if events else (after_seq or 0),
+    }
+    if after_seq is None:
+        # Runs recorded before pipeline_events only have log_summary.
+        lines = [log_summary or ""] + [
+            f"[{e['ts'].strftime('%H:%M:%S')}] {e['message']}" for e in events
+        ]
+        response["log_summary"] = "\n".join(line for line in lines if line)
+    return response
+
+@app.get("/api/users/{user_id}/feed")
+async def get_user_feed(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    x_api_key: Optional[str] = Header(None),
+):
+    """
+    One page of a user's recommendation feed, newest first.
+    Follow `next_cursor` for the next page; it is null on the last page.
+    """
+    cron_secret = os.getenv("CRON_SECRET")
+    if cron_secret and x_api_key != cron_secret:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+
+    async with get_async_session() as session:
+        try:
+            return await AsyncRepository(session).get_user_feed_page(
+                user_id, limit=limit, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/search")
+async def search_digests(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+):
+    """Ranked full-text search over digests and their source articles."""
+    async with get_async_session() as session:
+        results = await AsyncRepository(session).search_digests(q, limit=limit, offset=offset)
+    return {"query": q, "results": results, "limit": limit, "offset": offset}
 
 def run_daily_pipeline_task():
     try:
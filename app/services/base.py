@@ -1,61 +1,126 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Set, Tuple
 from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import heapq
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 
+def default_concurrency() -> int:
+    """Worker threads per processor, from PROCESS_CONCURRENCY (default 1 = sequential)."""
+    return max(1, int(os.getenv("PROCESS_CONCURRENCY", "1")))
+
+
+def default_batch_size() -> int:
+    """Results per save_results flush, from PROCESS_BATCH_SIZE (default 25)."""
+    return max(1, int(os.getenv("PROCESS_BATCH_SIZE", "25")))
+
+
+def merge_by_priority(
+    streams: Iterable[Iterable[Any]], priority: Callable[[Any], float]
+) -> Iterator[Any]:
+    """
+    Priority scheduler: merge streams that are each already ordered by descending
+    `priority` into one stream in global descending order. Only the head of each
+    stream is held in memory, so it composes with keyset-paged backlogs.
+    """
+    return heapq.merge(*streams, key=priority, reverse=True)
+
+
 class BaseProcessService(ABC):
-    def __init__(self):
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_age_hours: Optional[int] = None,
+    ):
         self.logger = logger
+        self.concurrency = max(1, concurrency) if concurrency else default_concurrency()
+        self.batch_size = max(1, batch_size) if batch_size else default_batch_size()
+        # Items older than this are left pending instead of processed (None = no cutoff)
+        self.max_age_hours = max_age_hours
 
     @abstractmethod
     def process_item(self, item: Any) -> Optional[Any]:
         pass
 
     @abstractmethod
-    def get_items_to_process(self, limit: Optional[int] = None) -> list:
+    def iter_items_to_process(self, limit: Optional[int] = None) -> Iterable[Any]:
+        """Yield pending items lazily, paging through the backlog in chunks."""
         pass
 
+    def count_items_to_process(self) -> Optional[int]:
+        """Cheap backlog size for progress logging; None if unknown."""
+        return None
+
+    def get_items_to_process(self, limit: Optional[int] = None) -> list:
+        return list(self.iter_items_to_process(limit=limit))
+
     @abstractmethod
     def save_result(self, item: Any, result: Any) -> bool:
         pass
 
+    def save_results(self, batch: List[Tuple[Any, Any]]) -> List[bool]:
+        """
+        Persist a batch of (item, result) pairs, returning one flag per pair.
+
+        Subclasses override this with a bulk repository write and a single commit.
+        If it raises, the batch is rolled back and retried row by row via save_result.
+        """
+        return [self.save_result(item, result) for item, result in batch]
+
     def process(self, limit: Optional[int] = None) -> Dict[str, Any]:
-        items = self.get_items_to_process(limit=limit)
-        total = len(items)
+        expected = self.count_items_to_process()
+        if expected is not None and limit:
+            expected = min(expected, limit)
+        total = 0
         processed = 0
         failed = 0
 
-        self.logger.info(f"Starting processing for {total} items")
-
-        for idx, item in enumerate(items, 1):
-            item_id = self._get_item_id(item)
-            item_title = self._get_item_title(item)
-            display_title = item_title[:60] + "..." if len(item_title) > 60 else item_title
-
-            self.logger.info(f"[{idx}/{total}] Processing {display_title} (ID: {item_id})")
-
-            try:
-                result = self.process_item(item)
-                if result:
-                    if self.save_result(item, result):
-                        processed += 1
-                        self.logger.info(f"✓ Successfully processed {item_id}")
-                    else:
-                        failed += 1
-                        self.logger.warning(f"✗ Failed to save result for {item_id}")
+        self.logger.info(
+            f"Starting processing for {expected if expected is not None else 'pending'} items "
+            f"(concurrency={self.concurrency})"
+        )
+
+        def announced():
+            nonlocal total
+            for idx, item in enumerate(self.iter_items_to_process(limit=limit), 1):
+                total = idx
+                item_title = self._get_item_title(item)
+                display_title = item_title[:60] + "..." if len(item_title) > 60 else item_title
+                self.logger.info(f"[{idx}/{expected or '?'}] Processing {display_title} (ID: {self._get_item_id(item)})")
+                yield item
+
+        batch: List[Tuple[Any, Any]] = []
+
+        def flush():
+            nonlocal processed, failed
+            for (item, _), saved in zip(batch, self._save_batch(batch)):
+                item_id = self._get_item_id(item)
+                if saved:
+                    processed += 1
+                    self.logger.info(f"✓ Successfully processed {item_id}")
                 else:
                     failed += 1
-                    self.logger.warning(f"✗ Failed to process {item_id}")
-            except Exception as e:
+                    self.logger.warning(f"✗ Failed to save result for {item_id}")
+            batch.clear()
+
+        # Workers only run process_item; this loop is the single writer for results.
+        for item, result, error in self._run_workers(announced()):
+            item_id = self._get_item_id(item)
+            if error is not None:
                 failed += 1
-                self.logger.error(f"✗ Error processing {item_id}: {e}")
-                if hasattr(self, "repo") and hasattr(self.repo, "session"):
-                    try:
-                        self.repo.session.rollback()
-                    except Exception as rollback_err:
-                        self.logger.error(f"✗ Failed to rollback session: {rollback_err}")
+                self.logger.error(f"✗ Error processing {item_id}: {error}")
+            elif result:
+                batch.append((item, result))
+                if len(batch) >= self.batch_size:
+                    flush()
+            else:
+                failed += 1
+                self.logger.warning(f"✗ Failed to process {item_id}")
+        flush()
 
         self.logger.info(f"Processing complete: {processed} processed, {failed} failed out of {total} total")
 
@@ -65,6 +130,82 @@ class BaseProcessService(ABC):
             "failed": failed
         }
 
+    def _save_batch(self, batch: List[Tuple[Any, Any]]) -> List[bool]:
+        if not batch:
+            return []
+        try:
+            return [bool(saved) for saved in self.save_results(batch)]
+        except Exception as e:
+            self.logger.warning(f"Batch save of {len(batch)} results failed ({e}); retrying row by row")
+            self._rollback()
+
+        outcomes = []
+        for item, result in batch:
+            try:
+                outcomes.append(bool(self.save_result(item, result)))
+            except Exception as e:
+                self.logger.error(f"✗ Error saving {self._get_item_id(item)}: {e}")
+                self._rollback()
+                outcomes.append(False)
+        return outcomes
+
+    def _rollback(self) -> None:
+        if hasattr(self, "repo") and hasattr(self.repo, "session"):
+            try:
+                self.repo.session.rollback()
+            except Exception as rollback_err:
+                self.logger.error(f"✗ Failed to rollback session: {rollback_err}")
+
+    def group_items(self, items: Iterable[Any]) -> Iterator[List[Any]]:
+        """Split the item stream into units of work; by default one item per unit."""
+        for item in items:
+            yield [item]
+
+    def process_items(self, items: List[Any]) -> List[Optional[Any]]:
+        """
+        Process one unit from group_items, returning a result per item.
+        Subclasses override this together with group_items to batch remote calls.
+        """
+        return [self.process_item(item) for item in items]
+
+    def _call_process_items(self, items: List[Any]) -> List[Tuple[Any, Optional[Any], Optional[Exception]]]:
+        try:
+            if len(items) == 1:
+                return [(items[0], self.process_item(items[0]), None)]
+            return [(item, result, None) for item, result in zip(items, self.process_items(items))]
+        except Exception as e:
+            return [(item, None, e) for item in items]
+
+    def _run_workers(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Optional[Any], Optional[Exception]]]:
+        """
+        Run the units from group_items and yield (item, result, error) in completion order.
+
+        At most 2 x concurrency units are in flight, so the backlog is still pulled
+        lazily from the database. With concurrency 1 everything runs inline.
+        """
+        units = self.group_items(items)
+        if self.concurrency <= 1:
+            for unit in units:
+                yield from self._call_process_items(unit)
+            return
+
+        pending: Set[Future] = set()
+        exhausted = False
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=type(self).__name__) as pool:
+            while True:
+                while not exhausted and len(pending) < self.concurrency * 2:
+                    try:
+                        unit = next(units)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(pool.submit(self._call_process_items, unit))
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
     def _get_item_id(self, item: Any) -> str:
         if hasattr(item, "id"):
             return str(item.id)
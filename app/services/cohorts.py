@@ -0,0 +1,137 @@
+"""
+Profile cohorts for sharing one LLM ranking across users.
+
+Users whose profiles agree on title, interests, expertise level and config
+flags (after normalisation) form a cohort. The cohort is ranked once over the
+union of its members' candidates; each member then takes that ranking
+filtered to the digests they have not seen, merged with the scores stored for
+them in earlier runs (ranking_for_member keeps scores from different curator
+passes apart). Only digests that some member has never been scored on reach
+the LLM.
+
+Quality trade-off: a cohort of one is ranked with the member's own profile,
+exactly as without cohorts. A larger cohort is ranked with a canonical
+profile that keeps title, background and expertise but replaces the name
+with "Reader", so its members lose only the name-based personalisation of
+the ranking. Keying on title splits readers who share interests but not a
+job title, which costs some sharing in exchange for rankings that still see
+each member's role. Because the canonical prompt depends only on
+(fingerprint, candidate set), the persistent LLM response cache also reuses a
+cohort ranking across runs.
+"""
+
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.agent.curator_agent import SCORE_PASS_CHUNK, RankedArticle
+
+
+def _norm(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def profile_fingerprint(profile: Dict) -> str:
+    """Stable hash of the ranking-relevant parts of a UserService profile."""
+    canonical = {
+        "title": _norm(profile.get("title")),
+        "interests": sorted({_norm(i) for i in profile.get("interests") or [] if _norm(i)}),
+        "expertise_level": _norm(profile.get("expertise_level")),
+        "preferences": {
+            _norm(k): _norm(v) if not isinstance(v, (list, dict)) else json.dumps(v, sort_keys=True)
+            for k, v in (profile.get("preferences") or {}).items()
+        },
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def cohort_profile(profile: Dict) -> Dict:
+    """The profile a multi-member cohort is ranked with: the shared fields, no name."""
+    interests = sorted({i.strip() for i in profile.get("interests") or [] if i and i.strip()}, key=_norm)
+    return {
+        "name": "Reader",
+        "title": profile.get("title") or "",
+        "background": profile.get("background") or "",
+        "expertise_level": profile.get("expertise_level") or "",
+        "interests": interests,
+        "preferences": dict(sorted((profile.get("preferences") or {}).items())),
+    }
+
+
+def group_into_cohorts(jobs: List[Tuple], scored: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+    """
+    Group (user, profile, unseen_digests) jobs by profile fingerprint. Returns
+    dicts with fingerprint, profile (the member's own for a cohort of one,
+    otherwise canonical), members (job indexes) and
+    candidates: the members' unseen digests that are not yet in `scored`
+    ({user_id: {digest_id: ...}}) for that member, unioned in first-seen order.
+    """
+    scored = scored or {}
+    cohorts: Dict[str, Dict] = {}
+    for index, (user, profile, unseen) in enumerate(jobs):
+        already = scored.get(user.id, {})
+        unseen = [d for d in unseen if d["id"] not in already]
+        fingerprint = profile_fingerprint(profile)
+        cohort = cohorts.get(fingerprint)
+        if cohort is None:
+            cohort = cohorts[fingerprint] = {
+                "fingerprint": fingerprint,
+                "profile": profile,
+                "members": [],
+                "candidates": [],
+                "_ids": set(),
+            }
+        cohort["members"].append(index)
+        for digest in unseen:
+            if digest["id"] not in cohort["_ids"]:
+                cohort["_ids"].add(digest["id"])
+                cohort["candidates"].append(digest)
+    for cohort in cohorts.values():
+        del cohort["_ids"]
+        if len(cohort["members"]) > 1:
+            cohort["profile"] = cohort_profile(cohort["profile"])
+    return list(cohorts.values())
+
+
+def ranking_for_member(
+    ranked: List[RankedArticle],
+    unseen: Iterable[Dict],
+    stored: Optional[Dict[str, Dict]] = None,
+) -> List[RankedArticle]:
+    """
+    One member's ranking: the cohort's fresh ranking restricted to the member's
+    unseen digests, merged with scores stored for them in earlier runs (see
+    Repository.get_digest_scores). Scores are only compared within a pass:
+
+    1. the fresh ranked entries (single call or refined top pool), in the
+       curator's order;
+    2. stored ranked entries from earlier runs, by score;
+    3. chunk-pass scores, fresh and stored (and stored rows that predate
+       score_pass), by score with fresh entries first on ties.
+
+    Ranks are renumbered from 1.
+    """
+    allowed = {d["id"] for d in unseen}
+    head: List[RankedArticle] = []
+    tail: List[RankedArticle] = []
+    fresh = set()
+    for article in ranked:
+        if article.digest_id in allowed and article.digest_id not in fresh:
+            fresh.add(article.digest_id)
+            (tail if article.score_pass == SCORE_PASS_CHUNK else head).append(article)
+    earlier: List[RankedArticle] = []
+    for digest_id, score in (stored or {}).items():
+        if digest_id not in allowed or digest_id in fresh:
+            continue
+        article = RankedArticle(
+            digest_id=digest_id,
+            relevance_score=score["relevance_score"],
+            rank=1,
+            reasoning=score.get("reasoning") or "",
+            score_pass=score.get("score_pass") or SCORE_PASS_CHUNK,
+        )
+        (tail if article.score_pass == SCORE_PASS_CHUNK else earlier).append(article)
+    earlier.sort(key=lambda a: -a.relevance_score)
+    tail.sort(key=lambda a: -a.relevance_score)
+    ordered = head + earlier + tail
+    return [a.model_copy(update={"rank": position}) for position, a in enumerate(ordered, start=1)]
@@ -22,11 +22,22 @@ def send_email(subject: str, body_text: str, body_html: str = None, recipients:
     if not recipients:
         raise ValueError("No valid recipients provided")
     
+    _check_credentials()
+    msg = _build_message(subject, body_text, body_html, recipients)
+    
+    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
+        smtp.login(MY_EMAIL, APP_PASSWORD)
+        smtp.sendmail(MY_EMAIL, recipients, msg.as_string())
+
+
+def _check_credentials():
     if not MY_EMAIL:
         raise ValueError("MY_EMAIL environment variable is not set")
     if not APP_PASSWORD:
         raise ValueError("APP_PASSWORD environment variable is not set")
-    
+
+
+def _build_message(subject: str, body_text: str, body_html: str, recipients: list) -> MIMEMultipart:
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"] = f"Helix AI <{MY_EMAIL}>"
@@ -38,10 +49,39 @@ def send_email(subject: str, body_text: str, body_html: str = None, recipients:
     if body_html:
         part2 = MIMEText(body_html, "html")
         msg.attach(part2)
-    
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
+    return msg
+
+
+def send_emails_batch(messages: list) -> list:
+    """
+    Send many single-recipient emails over one SMTP login.
+    `messages` holds dicts with to_email, subject, body_text and optional body_html.
+    Returns one bool per message; a failed message (any error, including a
+    dropped connection) does not stop the rest or lose the results already
+    collected. Only a failed connect or login raises.
+    """
+    if not messages:
+        return []
+    _check_credentials()
+    results = []
+    smtp = smtplib.SMTP_SSL("smtp.gmail.com", 465)
+    try:
         smtp.login(MY_EMAIL, APP_PASSWORD)
-        smtp.sendmail(MY_EMAIL, recipients, msg.as_string())
+        for m in messages:
+            try:
+                msg = _build_message(m["subject"], m["body_text"], m.get("body_html"), [m["to_email"]])
+                smtp.sendmail(MY_EMAIL, [m["to_email"]], msg.as_string())
+                results.append(True)
+            except Exception:
+                results.append(False)
+    finally:
+        # Every message has been handed over (or failed) by now; a failing
+        # QUIT must not turn delivered messages into errors.
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+    return results
 
 
 def resolve_article_thumbnail_url(article) -> str | None:
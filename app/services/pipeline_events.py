@@ -0,0 +1,88 @@
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.database.repository import Repository
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineEventLog:
+    """
+    Buffered, append-only progress log for a pipeline run.
+
+    Messages are queued in memory and written to `pipeline_events` in batches,
+    either when the buffer fills up or when `flush_interval` seconds have passed,
+    so each message costs one row instead of a rewrite of the whole run log.
+    Stage changes and ERROR events are written at once: the first message of a
+    stage may be followed by minutes of silence, and the dashboard should show
+    it (and anything queued before it) right away.
+    """
+
+    def __init__(
+        self,
+        repo: Repository,
+        run_id: Optional[str],
+        batch_size: int = 20,
+        flush_interval: float = 2.0,
+    ):
+        self.repo = repo
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stage: Optional[str] = None
+        self._seq = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._stage_started = False
+
+    def set_stage(self, stage: str) -> None:
+        self.flush()
+        self.stage = stage
+        self._stage_started = True
+
+    def emit(
+        self,
+        message: str,
+        level: str = "INFO",
+        stage: Optional[str] = None,
+        **fields: Any,
+    ) -> None:
+        if not self.run_id:
+            return
+        self._seq += 1
+        self._buffer.append(
+            {
+                "run_id": self.run_id,
+                "seq": self._seq,
+                "ts": datetime.now(timezone.utc),
+                "stage": stage or self.stage,
+                "level": level,
+                "message": message.strip(),
+                "fields": json.dumps(fields, default=str) if fields else None,
+            }
+        )
+        stage_start, self._stage_started = self._stage_started, False
+        if (
+            stage_start
+            or level == "ERROR"
+            or len(self._buffer) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            self.repo.add_pipeline_events(batch)
+        except Exception as e:
+            logger.warning(f"Failed to write {len(batch)} pipeline events: {e}")
+            try:
+                self.repo.session.rollback()
+            except Exception:
+                pass
@@ -5,13 +5,16 @@ from .base import BaseProcessService
 
 
 class AnthropicMarkdownProcessor(BaseProcessService):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, concurrency: Optional[int] = None, batch_size: Optional[int] = None):
+        super().__init__(concurrency, batch_size)
         self.scraper = AnthropicScraper()
         self.repo = Repository()
 
-    def get_items_to_process(self, limit: Optional[int] = None) -> list:
-        return self.repo.get_anthropic_articles_without_markdown(limit=limit)
+    def iter_items_to_process(self, limit: Optional[int] = None):
+        return self.repo.iter_anthropic_articles_without_markdown(limit=limit)
+
+    def count_items_to_process(self) -> int:
+        return self.repo.count_anthropic_articles_without_markdown()
 
     def process_item(self, item) -> Optional[str]:
         return self.scraper.url_to_markdown(item.url)
@@ -19,9 +22,13 @@ class AnthropicMarkdownProcessor(BaseProcessService):
     def save_result(self, item, result: str) -> bool:
         return self.repo.update_anthropic_article_markdown(item.guid, result)
 
+    def save_results(self, batch) -> list:
+        saved = self.repo.update_anthropic_articles_markdown({item.guid: result for item, result in batch})
+        return [item.guid in saved for item, _ in batch]
+
 
-def process_anthropic_markdown(limit: Optional[int] = None) -> dict:
-    processor = AnthropicMarkdownProcessor()
+def process_anthropic_markdown(limit: Optional[int] = None, concurrency: Optional[int] = None) -> dict:
+    processor = AnthropicMarkdownProcessor(concurrency)
     return processor.process(limit=limit)
 
 
@@ -1,8 +1,11 @@
 from typing import Optional
 import logging
-from app.agent.digest_agent import DigestAgent, DigestOutput
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from app.agent.base import llm_concurrency
+from app.agent.digest_agent import DigestAgent, DigestOutput, pack_digest_batches
 from app.database.repository import Repository
-from .base import BaseProcessService
+from .base import BaseProcessService, merge_by_priority
 
 logging.basicConfig(
     level=logging.INFO,
@@ -11,14 +14,50 @@ logging.basicConfig(
 )
 
 
+# Recency bonus per source, in hours: an item from a weighted source is ordered as
+# if it had been published this many hours later. Unlisted sources get 0.
+SOURCE_WEIGHT_HOURS = {
+    "anthropic": 12,
+    "openai": 12,
+    "youtube": 6,
+}
+
+
 class DigestProcessor(BaseProcessService):
-    def __init__(self):
-        super().__init__()
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_age_hours: Optional[int] = None,
+    ):
+        # LLM-bound: default to LLM_CONCURRENCY workers; the shared rate limiter paces them.
+        super().__init__(concurrency or llm_concurrency(), batch_size, max_age_hours)
         self.agent = DigestAgent()
         self.repo = Repository()
 
-    def get_items_to_process(self, limit: Optional[int] = None) -> list:
-        return self.repo.get_articles_without_digest(limit=limit)
+    def _since(self) -> Optional[datetime]:
+        if self.max_age_hours is None:
+            return None
+        return datetime.now(timezone.utc) - timedelta(hours=self.max_age_hours)
+
+    def priority(self, item: dict) -> float:
+        published_at = item["published_at"]
+        if published_at.tzinfo is None:
+            published_at = published_at.replace(tzinfo=timezone.utc)
+        return published_at.timestamp() + SOURCE_WEIGHT_HOURS.get(item["type"], 0) * 3600
+
+    def iter_items_to_process(self, limit: Optional[int] = None):
+        # One newest-first stream per source; the weight is constant within a
+        # stream, so merging them yields exact global priority order.
+        since = self._since()
+        streams = [
+            self.repo.iter_articles_without_digest(article_type=t, since=since, newest_first=True)
+            for t in self.repo.get_pending_article_types(since=since)
+        ]
+        return islice(merge_by_priority(streams, self.priority), limit)
+
+    def count_items_to_process(self) -> int:
+        return self.repo.count_articles_without_digest(since=self._since())
 
     def process_item(self, item: dict) -> Optional[DigestOutput]:
         return self.agent.generate_digest(
@@ -27,6 +66,22 @@ class DigestProcessor(BaseProcessService):
             article_type=item["type"]
         )
 
+    def group_items(self, items):
+        # Pack several articles into one chat completion, sized to a token budget.
+        return pack_digest_batches(items)
+
+    def process_items(self, items: list) -> list:
+        digests = self.agent.generate_digests([
+            {
+                "key": self._get_item_id(item),
+                "title": item["title"],
+                "content": item["content"],
+                "article_type": item["type"],
+            }
+            for item in items
+        ])
+        return [digests.get(self._get_item_id(item)) for item in items]
+
     def save_result(self, item: dict, result: DigestOutput) -> bool:
         try:
             self.repo.create_digest(
@@ -37,11 +92,29 @@ class DigestProcessor(BaseProcessService):
                 summary=result.summary,
                 published_at=item.get("published_at"),
                 image_url=item.get("image_url"),
+                content=item.get("content"),
             )
             return True
         except Exception:
+            self.repo.session.rollback()
             return False
 
+    def save_results(self, batch) -> list:
+        self.repo.create_digests([
+            {
+                "article_type": item["type"],
+                "article_id": item["id"],
+                "url": item["url"],
+                "title": result.title,
+                "summary": result.summary,
+                "published_at": item.get("published_at"),
+                "image_url": item.get("image_url"),
+                "content": item.get("content"),
+            }
+            for item, result in batch
+        ])
+        return [True] * len(batch)
+
     def _get_item_id(self, item: dict) -> str:
         return f"{item['type']}:{item['id']}"
 
@@ -49,8 +122,12 @@ class DigestProcessor(BaseProcessService):
         return item["title"]
 
 
-def process_digests(limit: Optional[int] = None) -> dict:
-    processor = DigestProcessor()
+def process_digests(
+    limit: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    max_age_hours: Optional[int] = None,
+) -> dict:
+    processor = DigestProcessor(concurrency, max_age_hours=max_age_hours)
     return processor.process(limit=limit)
 
 
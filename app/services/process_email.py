@@ -133,9 +133,11 @@ def send_digest_email(hours: int = 24, top_n: int = 10) -> dict:
         return {"success": False, "error": str(e)}
 
 
-def send_personalized_email(user, user_profile: dict, top_articles: list) -> dict:
+def send_personalized_email(user, user_profile: dict, top_articles: list, introduction=None) -> dict:
     """
     Sends a personalized email to a specific user based on pre-ranked articles.
+    `introduction` (an EmailIntroduction, e.g. from EmailAgent.generate_introductions)
+    skips the per-user introduction call.
     """
     email_agent = EmailAgent(user_profile)
     repo = Repository()
@@ -170,7 +172,8 @@ def send_personalized_email(user, user_profile: dict, top_articles: list) -> dic
         email_digest = email_agent.create_email_digest_response(
             ranked_articles=hydrated_articles, 
             total_ranked=len(hydrated_articles), 
-            limit=len(hydrated_articles)
+            limit=len(hydrated_articles),
+            introduction=introduction,
         )
 
         markdown_content = email_digest.to_markdown()
@@ -257,16 +260,13 @@ The Helix Team"""
         logger.error(f"Failed to send admin welcome email to {user.email}: {e}")
         return False
 
-def send_trial_warning_email(user, days_left: int) -> bool:
+def build_trial_warning_email(user, days_left: int) -> dict:
     """
-    Sends a warning email to a user when their trial is about to expire.
+    Builds the trial-expiring-soon message for send_emails_batch.
     """
-    try:
-        from app.services.email_sender import send_email_to_recipient
-        
-        subject = f"Action Required: {days_left} Day{'s' if days_left > 1 else ''} Left in Your Helix Trial ⏳"
-        
-        body_html = f"""<!DOCTYPE html>
+    subject = f"Action Required: {days_left} Day{'s' if days_left > 1 else ''} Left in Your Helix Trial ⏳"
+    
+    body_html = f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -296,25 +296,18 @@ def send_trial_warning_email(user, days_left: int) -> bool:
     </div>
 </body>
 </html>"""
-        
-        body_text = f"Hi {user.name},\n\nYour Helix trial expires in {days_left} day{'s' if days_left > 1 else ''}. Upgrade your subscription to keep receiving your daily personalized AI digests.\n\nUpgrade here: https://helix.news/pricing\n\nBest,\nThe Helix Team"
-        
-        send_email_to_recipient(user.email, subject, body_text, body_html)
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send trial warning email to {user.email}: {e}")
-        return False
+    
+    body_text = f"Hi {user.name},\n\nYour Helix trial expires in {days_left} day{'s' if days_left > 1 else ''}. Upgrade your subscription to keep receiving your daily personalized AI digests.\n\nUpgrade here: https://helix.news/pricing\n\nBest,\nThe Helix Team"
+    
+    return {"to_email": user.email, "subject": subject, "body_text": body_text, "body_html": body_html}
 
-def send_trial_expired_email(user) -> bool:
+def build_trial_expired_email(user) -> dict:
     """
-    Sends an email to a user when their trial has expired.
+    Builds the trial-expired message for send_emails_batch.
     """
-    try:
-        from app.services.email_sender import send_email_to_recipient
-        
-        subject = "Your Helix Trial Has Expired 🛑"
-        
-        body_html = f"""<!DOCTYPE html>
+    subject = "Your Helix Trial Has Expired 🛑"
+    
+    body_html = f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -344,11 +337,38 @@ def send_trial_expired_email(user) -> bool:
     </div>
 </body>
 </html>"""
-        
-        body_text = f"Hi {user.name},\n\nYour free trial of Helix has expired. To reactivate your daily digests, please subscribe to one of our premium plans.\n\nSubscribe here: https://helix.news/pricing\n\nBest,\nThe Helix Team"
-        
-        send_email_to_recipient(user.email, subject, body_text, body_html)
-        return True
+    
+    body_text = f"Hi {user.name},\n\nYour free trial of Helix has expired. To reactivate your daily digests, please subscribe to one of our premium plans.\n\nSubscribe here: https://helix.news/pricing\n\nBest,\nThe Helix Team"
+    
+    return {"to_email": user.email, "subject": subject, "body_text": body_text, "body_html": body_html}
+
+def send_trial_warning_email(user, days_left: int) -> bool:
+    """
+    Sends a warning email to a user when their trial is about to expire.
+    """
+    return send_trial_emails_batch([build_trial_warning_email(user, days_left)])[0]
+
+def send_trial_expired_email(user) -> bool:
+    """
+    Sends an email to a user when their trial has expired.
+    """
+    return send_trial_emails_batch([build_trial_expired_email(user)])[0]
+
+def send_trial_emails_batch(messages: list) -> list:
+    """
+    Sends prepared trial messages over one SMTP connection.
+    Returns one success flag per message.
+    """
+    from app.services.email_sender import send_emails_batch
+
+    if not messages:
+        return []
+    try:
+        results = send_emails_batch(messages)
     except Exception as e:
-        logger.error(f"Failed to send trial expired email to {user.email}: {e}")
-        return False
+        logger.error(f"Failed to send {len(messages)} trial emails: {e}")
+        return [False] * len(messages)
+    for m, ok in zip(messages, results):
+        if not ok:
+            logger.error(f"Failed to send trial email to {m['to_email']}")
+    return results
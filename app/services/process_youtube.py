@@ -8,14 +8,17 @@ TRANSCRIPT_UNAVAILABLE_MARKER = "__UNAVAILABLE__"
 
 
 class YouTubeTranscriptProcessor(BaseProcessService):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, concurrency: Optional[int] = None, batch_size: Optional[int] = None):
+        super().__init__(concurrency, batch_size)
         self.scraper = YouTubeScraper()
         self.repo = Repository()
         self.unavailable = 0
 
-    def get_items_to_process(self, limit: Optional[int] = None) -> list:
-        return self.repo.get_youtube_videos_without_transcript(limit=limit)
+    def iter_items_to_process(self, limit: Optional[int] = None):
+        return self.repo.iter_youtube_videos_without_transcript(limit=limit)
+
+    def count_items_to_process(self) -> int:
+        return self.repo.count_youtube_videos_without_transcript()
 
     def process_item(self, item) -> Optional[str]:
         try:
@@ -30,14 +33,22 @@ class YouTubeTranscriptProcessor(BaseProcessService):
             self.unavailable += 1
         return success
 
+    def save_results(self, batch) -> list:
+        saved = self.repo.update_youtube_video_transcripts({item.video_id: result for item, result in batch})
+        self.unavailable += sum(
+            1 for item, result in batch
+            if item.video_id in saved and result == TRANSCRIPT_UNAVAILABLE_MARKER
+        )
+        return [item.video_id in saved for item, _ in batch]
+
     def process(self, limit: Optional[int] = None) -> dict:
         result = super().process(limit=limit)
         result["unavailable"] = self.unavailable
         return result
 
 
-def process_youtube_transcripts(limit: Optional[int] = None) -> dict:
-    processor = YouTubeTranscriptProcessor()
+def process_youtube_transcripts(limit: Optional[int] = None, concurrency: Optional[int] = None) -> dict:
+    processor = YouTubeTranscriptProcessor(concurrency)
     return processor.process(limit=limit)
 
 
@@ -0,0 +1,127 @@
+"""
+Local relevance prefilter that runs before LLM ranking.
+
+Digests (title + summary) are embedded as TF-IDF vectors over a vocabulary
+built from the digests themselves, and each user profile (interests, weighted
+above title/background) is projected into the same space. One matrix product
+gives the user x digest affinity for every active user, and only each user's
+top-K unseen digests are sent to `CuratorAgent`. No network, CPU only.
+"""
+
+import math
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Candidates kept per user (RELEVANCE_TOP_K); 0 disables the prefilter.
+DEFAULT_TOP_K = 40
+BACKGROUND_WEIGHT = 0.5
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be but by can do for from has have how in into is it its
+new of on or our that the their this to was we what when which who will with
+you your not more than about also been they them these those all any over
+""".split())
+
+
+def relevance_top_k() -> int:
+    return max(0, int(os.getenv("RELEVANCE_TOP_K", DEFAULT_TOP_K)))
+
+
+def _terms(text: str) -> List[str]:
+    words = []
+    for word in _WORD.findall((text or "").lower()):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        # Cheap plural folding so "agents" matches "agent".
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def profile_text(profile: Dict) -> Dict[str, str]:
+    """Split a UserService.get_user_profile dict into weighted text fields."""
+    interests = profile.get("interests") or []
+    return {
+        "interests": " ".join(str(i) for i in interests),
+        "background": f"{profile.get('title') or ''} {profile.get('background') or ''}",
+    }
+
+
+class RelevanceIndex:
+    """TF-IDF index over a fixed set of digests (dicts with id, title, summary)."""
+
+    def __init__(self, digests: Sequence[Dict]):
+        self.ids = [d["id"] for d in digests]
+        self.column = {digest_id: i for i, digest_id in enumerate(self.ids)}
+        docs = [_terms(f"{d.get('title') or ''} {d.get('summary') or ''}") for d in digests]
+
+        self.vocab: Dict[str, int] = {}
+        for terms in docs:
+            for term in terms:
+                self.vocab.setdefault(term, len(self.vocab))
+
+        df = np.zeros(len(self.vocab), dtype=np.float32)
+        for terms in docs:
+            for term in set(terms):
+                df[self.vocab[term]] += 1
+        # Smoothed idf, as in scikit-learn's TfidfVectorizer.
+        self.idf = np.log((1 + len(docs)) / (1 + df)) + 1
+        self.matrix = self._vectorize(docs)
+
+    def _vectorize(self, docs: List[List[str]]) -> np.ndarray:
+        """Rows of L2-normalised sublinear-tf * idf vectors; unknown terms are ignored."""
+        matrix = np.zeros((len(docs), len(self.vocab)), dtype=np.float32)
+        for row, terms in enumerate(docs):
+            counts: Dict[int, int] = {}
+            for term in terms:
+                column = self.vocab.get(term)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            for column, count in counts.items():
+                matrix[row, column] = 1 + math.log(count)
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    def affinity(self, profiles: Sequence[Dict]) -> np.ndarray:
+        """users x digests cosine affinity for UserService profile dicts."""
+        if not profiles or not self.ids:
+            return np.zeros((len(profiles), len(self.ids)), dtype=np.float32)
+        fields = [profile_text(p) for p in profiles]
+        users = self._vectorize([_terms(f["interests"]) for f in fields])
+        users += BACKGROUND_WEIGHT * self._vectorize([_terms(f["background"]) for f in fields])
+        return users @ self.matrix.T
+
+
+def prefilter_candidates(
+    digests: Sequence[Dict],
+    profiles: Sequence[Dict],
+    candidates: Sequence[List[Dict]],
+    top_k: Optional[int] = None,
+) -> List[List[Dict]]:
+    """
+    For each (profile, candidate digests) pair keep the `top_k` candidates with
+    the highest affinity, in their original order. `digests` is the full window
+    the candidates are drawn from. Users whose profile shares no terms with any
+    digest keep all their candidates, so they are never starved.
+    """
+    top_k = relevance_top_k() if top_k is None else top_k
+    if not top_k or all(len(c) <= top_k for c in candidates):
+        return [list(c) for c in candidates]
+
+    index = RelevanceIndex(digests)
+    scores = index.affinity(profiles)
+    selected = []
+    for row, user_candidates in zip(scores, candidates):
+        if len(user_candidates) <= top_k or not row.any():
+            selected.append(list(user_candidates))
+            continue
+        columns = np.fromiter((index.column[d["id"]] for d in user_candidates), dtype=np.int64)
+        keep = np.argpartition(-row[columns], top_k - 1)[:top_k]
+        selected.append([user_candidates[i] for i in np.sort(keep)])
+    return selected
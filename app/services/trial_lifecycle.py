@@ -0,0 +1,79 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from app.database.repository import Repository
+from app.services.process_email import (
+    build_trial_expired_email,
+    build_trial_warning_email,
+    send_trial_emails_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+TRIAL_DAYS = 27
+
+# days_left -> flag column that records the warning was sent
+WARNING_BUCKETS = {2: "trial_warning_2_sent", 1: "trial_warning_1_sent"}
+
+
+def trial_cutoff(now: datetime) -> datetime:
+    """Users created at or before this instant have used up their trial."""
+    return _naive_utc(now) - timedelta(days=TRIAL_DAYS)
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    # users.created_at is stored as naive UTC
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _send_and_flag(repo: Repository, users, messages, flag: str) -> int:
+    results = send_trial_emails_batch(messages)
+    sent_ids = [u.id for u, ok in zip(users, results) if ok]
+    repo.set_user_flag(sent_ids, flag)
+    return len(sent_ids)
+
+
+def process_trial_lifecycle(
+    repo: Repository,
+    now: datetime,
+    email_filter: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Set-based trial handling for all active non-admin users.
+
+    Each bucket (2 days left, 1 day left, expired) is one SELECT, its emails go
+    out over a single SMTP connection, and the sent flags are written with one
+    UPDATE. Expired users are then marked in bulk, so the personalization loop
+    only needs `Repository.get_active_users(trial_cutoff=...)`.
+    """
+    now = _naive_utc(now)
+    stats = {"warned_2": 0, "warned_1": 0, "expired_notified": 0, "expired": 0}
+
+    for days_left, flag in WARNING_BUCKETS.items():
+        # days_active == TRIAL_DAYS - days_left  <=>  created in (now - (d+1), now - d]
+        days_active = TRIAL_DAYS - days_left
+        users = repo.get_trial_users_created_between(
+            start=now - timedelta(days=days_active + 1),
+            end=now - timedelta(days=days_active),
+            unsent_flag=flag,
+            email=email_filter,
+        )
+        if users:
+            logger.info(f"{len(users)} users have {days_left} day(s) left on trial. Sending warnings.")
+            messages = [build_trial_warning_email(u, days_left) for u in users]
+            stats[f"warned_{days_left}"] = _send_and_flag(repo, users, messages, flag)
+
+    cutoff = trial_cutoff(now)
+    expired = repo.get_trial_users_created_between(
+        start=None, end=cutoff, unsent_flag="trial_expired_sent", email=email_filter
+    )
+    if expired:
+        logger.info(f"{len(expired)} users have an expired trial. Sending expiration emails.")
+        messages = [build_trial_expired_email(u) for u in expired]
+        stats["expired_notified"] = _send_and_flag(repo, expired, messages, "trial_expired_sent")
+
+    stats["expired"] = repo.expire_trial_users(cutoff, email=email_filter)
+    return stats
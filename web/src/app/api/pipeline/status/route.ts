@@ -1,8 +1,15 @@
 import { NextResponse } from "next/server";
 import { db as prisma } from "@/lib/db";
 
-export async function GET() {
+function formatTime(ts: Date) {
+  return ts.toISOString().slice(11, 19);
+}
+
+export async function GET(request: Request) {
   try {
+    const afterParam = new URL(request.url).searchParams.get("after_seq");
+    const afterSeq = afterParam !== null ? Number(afterParam) || 0 : null;
+
     // Fetch the latest pipeline run
     const latestRun = await prisma.pipelineRun.findFirst({
       orderBy: {
@@ -17,15 +24,34 @@ export async function GET() {
       });
     }
 
+    // Progress messages live in the append-only pipeline_events table;
+    // pollers pass the last seq they saw to fetch only new events.
+    const events = await prisma.pipelineEvent.findMany({
+      where: { run_id: latestRun.id, seq: { gt: afterSeq ?? 0 } },
+      orderBy: { seq: "asc" },
+      take: afterSeq !== null ? 500 : 5000,
+    });
+    const lastSeq = events.length ? events[events.length - 1].seq : (afterSeq ?? 0);
+
     // Return in the same format the frontend expects
-    return NextResponse.json({
+    const body: Record<string, unknown> = {
       id: latestRun.id,
       status: latestRun.status,
       start_time: latestRun.start_time,
       end_time: latestRun.end_time,
-      log_summary: latestRun.log_summary,
       users_processed: latestRun.users_processed,
-    });
+      events,
+      last_seq: lastSeq,
+    };
+    if (afterSeq === null) {
+      body.log_summary = [
+        latestRun.log_summary ?? "",
+        ...events.map((e) => `[${formatTime(e.ts)}] ${e.message}`),
+      ]
+        .filter(Boolean)
+        .join("\n");
+    }
+    return NextResponse.json(body);
   } catch (error) {
     console.error("Error fetching pipeline status:", error);
     return NextResponse.json(